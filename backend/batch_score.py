@@ -0,0 +1,312 @@
+"""Offline corpus scorer: shard a large file across processes, stream results.
+
+    python -m batch_score INPUT -o OUTPUT.ndjson [--workers N] [--threshold 0.3]
+
+INPUT is .csv (text column picked like /analyze-file), .ndjson/.jsonl
+(strings or objects with a text field) or .txt (one text per line); use
+--format to override the extension. Empty texts are skipped, as in
+/analyze-file. Malformed records (bad NDJSON lines, CSV records the csv
+module rejects) are skipped too, and counted as malformed_rows in the
+summary.
+
+Each output line has the /analyze-bulk row shape:
+    {"index", "text" (first 200 chars), "risk_score", "labels", "highlights", "is_toxic"}
+with is_toxic = risk_score > threshold * 100.
+
+Progress is checkpointed to OUTPUT.ckpt after every chunk (input byte
+offset, rows done, output size, running totals). Re-running the same
+command resumes from there; --restart starts over.
+"""
+import argparse
+import csv
+import io
+import json
+import mmap
+import os
+import sys
+import time
+from collections import deque
+from multiprocessing import get_context
+from typing import Iterator, List, Optional, Tuple
+
+from model import ToxicityModel
+from textsource import pick_text_column, text_from_item
+
+FORMATS = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson", ".txt": "txt"}
+
+
+# ── Streaming readers ────────────────────────────────────────────────────────
+#
+# Readers walk a read-only mmap of the input and yield (text, end_offset)
+# where end_offset is the byte just past the record, so a checkpoint can
+# seek straight back to it. A record that can't be parsed yields text None.
+
+def _lines(mm: mmap.mmap, offset: int) -> Iterator[Tuple[bytes, int]]:
+    mm.seek(offset)
+    while True:
+        line = mm.readline()
+        if not line:
+            return
+        yield line, mm.tell()
+
+
+def read_txt(mm: mmap.mmap, offset: int) -> Iterator[Tuple[str, int]]:
+    for line, end in _lines(mm, offset):
+        yield line.decode("utf-8", errors="ignore").strip(), end
+
+
+def read_ndjson(mm: mmap.mmap, offset: int) -> Iterator[Tuple[Optional[str], int]]:
+    for line, end in _lines(mm, offset):
+        line = line.strip()
+        if line:
+            try:
+                item = json.loads(line)
+            except ValueError:      # bad JSON or bad UTF-8
+                yield None, end
+                continue
+            yield text_from_item(item) or "", end
+
+
+def read_csv(mm: mmap.mmap, offset: int) -> Iterator[Tuple[Optional[str], int]]:
+    # Header always comes from the top of the file, data from `offset`
+    pos = [0]
+
+    def decoded(start):
+        for line, end in _lines(mm, start):
+            pos[0] = end
+            yield line.decode("utf-8", errors="ignore")
+
+    header_reader = csv.reader(decoded(0))
+    fieldnames = next(header_reader, None)
+    if not fieldnames:
+        return
+    header_end = pos[0]
+    col = fieldnames.index(pick_text_column(fieldnames))
+
+    # csv pulls exactly the lines one record needs, so pos[0] is the record end
+    start = max(offset, header_end)
+    while True:
+        try:
+            for row in csv.reader(decoded(start)):
+                yield (row[col].strip() if col < len(row) else ""), pos[0]
+            return
+        except csv.Error:
+            # e.g. a field over csv.field_size_limit(): skip the lines the
+            # record used and carry on with a fresh reader
+            if pos[0] <= start:
+                return
+            yield None, pos[0]
+            start = pos[0]
+
+
+READERS = {"csv": read_csv, "ndjson": read_ndjson, "txt": read_txt}
+
+
+# ── Worker side ──────────────────────────────────────────────────────────────
+
+_model: Optional[ToxicityModel] = None
+
+
+def _init_worker():
+    global _model
+    _model = ToxicityModel()
+
+
+def score_chunk(start_index: int, texts: List[str], threshold: float):
+    """Score one chunk; returns serialized NDJSON plus stats for the parent."""
+    began = time.perf_counter()
+    out = io.StringIO()
+    toxic = 0
+    risk_total = 0.0
+    for i, text in enumerate(texts, start_index):
+        res = _model.analyze(text)
+        is_toxic = res.is_toxic(threshold)
+        toxic += is_toxic
+        risk_total += res.risk_score
+        out.write(json.dumps({
+            "index": i,
+            "text": text[:200],
+            "risk_score": res.risk_score,
+            "labels": res.labels(),
+            "highlights": res.highlights(),
+            "is_toxic": is_toxic,
+        }, ensure_ascii=False, separators=(",", ":")))
+        out.write("\n")
+    return out.getvalue().encode("utf-8"), len(texts), toxic, risk_total, time.perf_counter() - began, os.getpid()
+
+
+# ── Checkpointing ────────────────────────────────────────────────────────────
+
+def _input_identity(path: str) -> dict:
+    st = os.stat(path)
+    return {"input": os.path.abspath(path), "input_size": st.st_size, "input_mtime": st.st_mtime}
+
+
+def load_checkpoint(path: str, identity: dict, threshold: float) -> Optional[dict]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            ckpt = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if any(ckpt.get(k) != v for k, v in identity.items()) or ckpt.get("threshold") != threshold:
+        sys.exit(f"Checkpoint {path} belongs to a different input, format or threshold; use --restart")
+    ckpt.setdefault("malformed_rows", 0)     # written before malformed rows were counted
+    return ckpt
+
+
+def save_checkpoint(path: str, ckpt: dict):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(ckpt, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+# ── Driver ───────────────────────────────────────────────────────────────────
+
+def run(args) -> dict:
+    fmt = args.format or FORMATS.get(os.path.splitext(args.input)[1].lower())
+    if fmt not in READERS:
+        sys.exit("Unsupported input type. Use .csv, .ndjson/.jsonl or .txt (or --format)")
+
+    ckpt_path = args.checkpoint or args.output + ".ckpt"
+    # Offsets only make sense to the parser that produced them
+    identity = {**_input_identity(args.input), "format": fmt}
+    ckpt = None if args.restart else load_checkpoint(ckpt_path, identity, args.threshold)
+    if ckpt is None:
+        ckpt = {**identity, "threshold": args.threshold, "input_offset": 0, "rows_done": 0,
+                "output_bytes": 0, "toxic_count": 0, "risk_total": 0.0, "malformed_rows": 0,
+                "done": False}
+    elif ckpt["done"]:
+        print(f"{args.output} is already complete ({ckpt['rows_done']} rows)", file=sys.stderr)
+        return ckpt
+    else:
+        print(f"Resuming at row {ckpt['rows_done']}", file=sys.stderr)
+
+    out = open(args.output, "r+b" if ckpt["output_bytes"] else "wb")
+    out.truncate(ckpt["output_bytes"])     # drop anything written after the checkpoint
+    out.seek(ckpt["output_bytes"])
+
+    worker_rows: dict = {}
+    worker_secs: dict = {}
+    started = time.perf_counter()
+    rows_at_start = ckpt["rows_done"]
+    last_report = started
+
+    with open(args.input, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            mm = None
+            records: Iterator[Tuple[Optional[str], int]] = iter(())
+        else:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            records = READERS[fmt](mm, ckpt["input_offset"])
+
+        def chunks():
+            # Malformed records are counted with the chunk they precede, so
+            # the count is checkpointed together with the offset past them
+            index = ckpt["rows_done"]
+            texts: List[str] = []
+            malformed = 0
+            warned = 0
+            end = ckpt["input_offset"]
+            for text, end in records:
+                if text is None:
+                    malformed += 1
+                    warned += 1
+                    if warned <= 10:
+                        print(f"  skipping malformed record ending at byte {end}", file=sys.stderr)
+                elif text:
+                    texts.append(text)
+                    if len(texts) == args.chunk_size:
+                        yield index, texts, end, malformed
+                        index += len(texts)
+                        texts = []
+                        malformed = 0
+            if texts or malformed:
+                yield index, texts, end, malformed
+
+        ctx = get_context("spawn" if sys.platform == "win32" else "fork")
+        with ctx.Pool(args.workers, initializer=_init_worker) as pool:
+            # Bounded in-flight window keeps memory flat on huge inputs;
+            # results are written strictly in input order
+            pending: deque = deque()
+            source = chunks()
+            exhausted = False
+            while True:
+                while not exhausted and len(pending) < args.workers * 2:
+                    try:
+                        start_index, texts, end, malformed = next(source)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    job = pool.apply_async(score_chunk, (start_index, texts, args.threshold))
+                    pending.append((job, end, malformed))
+                if not pending:
+                    break
+
+                job, end, malformed = pending.popleft()
+                data, n, toxic, risk_total, secs, pid = job.get()
+                out.write(data)
+                out.flush()
+                os.fsync(out.fileno())
+
+                ckpt["input_offset"] = end
+                ckpt["rows_done"] += n
+                ckpt["output_bytes"] = out.tell()
+                ckpt["toxic_count"] += toxic
+                ckpt["risk_total"] += risk_total
+                ckpt["malformed_rows"] += malformed
+                save_checkpoint(ckpt_path, ckpt)
+
+                worker_rows[pid] = worker_rows.get(pid, 0) + n
+                worker_secs[pid] = worker_secs.get(pid, 0.0) + secs
+                now = time.perf_counter()
+                if now - last_report >= args.report_every:
+                    last_report = now
+                    rate = (ckpt["rows_done"] - rows_at_start) / (now - started)
+                    print(f"  {ckpt['rows_done']:>12,} rows  {rate:>10,.0f} rows/s", file=sys.stderr)
+
+        if mm is not None:
+            mm.close()
+
+    out.close()
+    ckpt["done"] = True
+    save_checkpoint(ckpt_path, ckpt)
+
+    elapsed = time.perf_counter() - started
+    print(f"\nScored {ckpt['rows_done'] - rows_at_start:,} rows in {elapsed:.1f}s "
+          f"({(ckpt['rows_done'] - rows_at_start) / elapsed if elapsed else 0:,.0f} rows/s)", file=sys.stderr)
+    for pid in sorted(worker_rows):
+        rate = worker_rows[pid] / worker_secs[pid] if worker_secs[pid] else 0.0
+        print(f"  worker {pid}: {worker_rows[pid]:>12,} rows  {rate:>10,.0f} rows/s", file=sys.stderr)
+    return ckpt
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Score a large corpus offline with ToxicityModel")
+    parser.add_argument("input", help=".csv, .ndjson/.jsonl or .txt")
+    parser.add_argument("-o", "--output", required=True, help="NDJSON output path")
+    parser.add_argument("--format", choices=sorted(READERS), help="override format detection")
+    parser.add_argument("--threshold", type=float, default=0.3, help="is_toxic threshold (default 0.3)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="worker processes")
+    parser.add_argument("--chunk-size", type=int, default=2000, help="rows per shard (default 2000)")
+    parser.add_argument("--checkpoint", help="checkpoint path (default OUTPUT.ckpt)")
+    parser.add_argument("--restart", action="store_true", help="ignore any checkpoint and start over")
+    parser.add_argument("--report-every", type=float, default=5.0, help="seconds between progress lines")
+    args = parser.parse_args(argv)
+
+    ckpt = run(args)
+    total = ckpt["rows_done"]
+    summary = {
+        "total": total,
+        "toxic_count": ckpt["toxic_count"],
+        "safe_count": total - ckpt["toxic_count"],
+        "avg_risk_score": round(ckpt["risk_total"] / total, 2) if total else 0,
+        "malformed_rows": ckpt["malformed_rows"],
+    }
+    print(json.dumps(summary))
+
+
+if __name__ == "__main__":
+    main()
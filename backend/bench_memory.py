@@ -0,0 +1,106 @@
+"""Memory benchmark: compact ScoreResult vs. dict results on a bulk job.
+
+    python bench_memory.py [rows]        # default 100000
+
+Scores `rows` synthetic social posts and keeps every result alive until the
+end, as bulk jobs do until the response is written. Each mode scores the
+whole corpus, then holds results as:
+  compact   → ScoreResult (__slots__, packed label floats, highlight bitset)
+  dict      → the {"risk_score", "labels", "highlights"} dict predict used to return
+  dict+row  → dict plus a per-row BulkResult pydantic object (old bulk path)
+Reports retained bytes per result, GC-tracked objects per result, and GC
+collections triggered while scoring.
+"""
+import gc
+import random
+import sys
+import time
+
+from model import LABELS, ScoreResult, ToxicityModel
+
+WORDS = (
+    "hello there friend this game was fun lol you are such an idiot waste of space "
+    "i will not kill you the boss fight yeah right genius nobody cares what you think "
+    "great job team good morning love this song stupid trash worthless go to hell"
+).split()
+
+
+def make_texts(n: int):
+    rng = random.Random(42)
+    return [" ".join(rng.choices(WORDS, k=rng.randint(4, 24))) for _ in range(n)]
+
+
+def deep_size(obj, shared) -> int:
+    """Bytes owned by one result; objects in `shared` (vocabulary, label names) don't count."""
+    if id(obj) in shared:
+        return 0
+    size = sys.getsizeof(obj)
+    if isinstance(obj, ScoreResult):
+        size += sum(deep_size(getattr(obj, a), shared) for a in ("risk_score", "_probs", "highlight_bits"))
+    elif isinstance(obj, dict):
+        size += sum(deep_size(k, shared) + deep_size(v, shared) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(deep_size(v, shared) for v in obj)
+    elif hasattr(obj, "__dict__"):
+        size += deep_size(obj.__dict__, shared)
+    return size
+
+
+def measure(name: str, build, shared):
+    gc.collect()
+    tracked_before = len(gc.get_objects())
+    collections_before = sum(s["collections"] for s in gc.get_stats())
+    start = time.perf_counter()
+
+    kept = build()
+
+    elapsed = time.perf_counter() - start
+    collections = sum(s["collections"] for s in gc.get_stats()) - collections_before
+    tracked = len(gc.get_objects()) - tracked_before - 1   # minus the list itself
+
+    n = len(kept)
+    sample = kept[:: max(1, n // 2000)]
+    per_result = sum(deep_size(r, shared) for r in sample) / len(sample)
+    print(f"  {name:<9} {per_result:>6.0f} B/result  {per_result * n / 2**20:>7.1f} MiB total  "
+          f"{tracked / n:>5.2f} GC-tracked/result  {collections:>5} GC runs  {elapsed:>6.2f} s")
+    return kept
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    model = ToxicityModel()
+    texts = make_texts(rows)
+    shared = {id(w) for w in model.highlight_vocab} | {id(label) for label in LABELS}
+    shared |= {id(t) for t in texts}   # row text is the caller's either way
+
+    print(f"Scoring and retaining {rows} results")
+    measure("compact", lambda: [model.analyze(t) for t in texts], shared)
+    measure("dict", lambda: [model.analyze(t).to_dict() for t in texts], shared)
+
+    try:
+        from pydantic import BaseModel
+    except ImportError:
+        return
+
+    class BulkResult(BaseModel):  # mirrors main.BulkResult
+        index: int
+        text: str
+        risk_score: float
+        labels: dict
+        highlights: list
+        is_toxic: bool
+
+    def old_bulk_rows():
+        rows_out = []
+        for i, text in enumerate(texts):
+            d = model.analyze(text).to_dict()
+            rows_out.append(BulkResult(index=i, text=text[:200], risk_score=d["risk_score"],
+                                       labels=d["labels"], highlights=d["highlights"],
+                                       is_toxic=d["risk_score"] > 30))
+        return rows_out
+
+    measure("dict+row", old_bulk_rows, shared)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Microbenchmark: tokenizer.tokenize and ToxicityModel.lexicon_tokens (what
+the rules actually use) vs. the old re.findall(r'\\b\\w+\\b').
+
+    python bench_tokenizer.py [posts]        # default 20000
+
+Runs both over a synthetic mix of typical social posts (mostly ASCII, with
+contractions, hashtags, mentions, URLs, plus some emoji / mixed-script
+posts) and reports ns per post, overall and per script class.
+"""
+import random
+import re
+import sys
+import timeit
+
+from model import ToxicityModel
+from tokenizer import tokenize
+
+_WORD_RE = re.compile(r'\b\w+\b')
+
+ASCII_POSTS = [
+    "lol this game is so bad, you're trash at it tbh #gaming #fail",
+    "@mike_23 don't be such an idiot... nobody cares what you think",
+    "Great job team!!! Can't wait for tomorrow's match 🙌",
+    "I hate mondays. Coffee first, then we'll talk.",
+    "check this out https://example.com/article?id=42 it's wild",
+    "you are a waste of space and everyone knows it",
+    "Thanks for the help yesterday, really appreciate it :)",
+    "OMG did u see that?? @jess @tom #breaking #news",
+    "whatever genius, yeah right like that matters",
+    "new blog post is up! link in bio #writing #amwriting",
+]
+UNICODE_POSTS = [
+    "c’est la vie… don’t @ me 😂😂 #mood",
+    "Это просто ужасно, ты идиот",
+    "今日はいい天気ですね #東京",
+    "naïve café owner said you’re welcome 👋",
+    "😡😡😡 you are pathetic 🤡",
+]
+
+
+def make_posts(n: int):
+    rng = random.Random(7)
+    # Roughly 85% ASCII, in line with typical English-language feeds
+    return [rng.choice(UNICODE_POSTS if rng.random() < 0.15 else ASCII_POSTS) + f" {i}"
+            for i in range(n)]
+
+
+def bench(fns, posts, repeat: int = 9):
+    # Interleave the contenders so machine noise hits them alike; best of `repeat`
+    best = [float("inf")] * len(fns)
+    for _ in range(repeat):
+        for i, fn in enumerate(fns):
+            best[i] = min(best[i], timeit.timeit(lambda: [fn(p) for p in posts], number=1))
+    return [b / len(posts) * 1e9 for b in best]
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    posts = [p.lower() for p in make_posts(n)]
+    ascii_posts = [p for p in posts if p.isascii()]
+    unicode_posts = [p for p in posts if not p.isascii()]
+
+    print(f"{n} posts ({len(ascii_posts)} ASCII, {len(unicode_posts)} non-ASCII), ns/post:\n")
+    lexicon_tokens = ToxicityModel().lexicon_tokens
+    print(f"  {'':<10} {'re.findall':>11} {'tokenize':>10} {'speedup':>8} {'lexicon_tokens':>15} {'speedup':>8}")
+    for name, group in (("all", posts), ("ascii", ascii_posts), ("unicode", unicode_posts)):
+        if not group:
+            continue
+        old, tok, lex = bench((_WORD_RE.findall, tokenize, lexicon_tokens), group)
+        print(f"  {name:<10} {old:>11.0f} {tok:>10.0f} {old / tok:>7.2f}x {lex:>15.0f} {old / lex:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Build the tiny bundled ONNX classifier used by the onnx/cascade engines.
+
+    python build_tiny_model.py [output.onnx]
+
+The model is a single linear layer + sigmoid over hashed bag-of-words
+features, seeded from the lexicon in model.py:
+  - each toxic keyword pushes its labels towards the lexicon score
+  - context reducers (gaming/news/medical...) and negations pull all labels down
+It is meant as a small, deterministic stand-in that exercises the batched
+ONNX Runtime path — swap in a trained model with the same input/output
+contract (features[N, feature_dim] → probs[N, 5]) for production use.
+
+Needs `pip install onnx numpy` (build time only).
+"""
+import math
+import os
+import sys
+
+import numpy as np
+import onnx
+from onnx import TensorProto, helper, numpy_helper
+
+from engines import DEFAULT_ONNX_MODEL, FEATURE_DIM, hash_bucket
+from model import LABELS, ToxicityModel
+
+BASELINE = 0.03          # same near-zero baseline the lexicon uses
+CONTEXT_WEIGHT = -1.2
+NEGATION_WEIGHT = -1.0
+
+
+def logit(p: float) -> float:
+    return math.log(p / (1 - p))
+
+
+def build_weights(model: ToxicityModel):
+    bias = np.full(len(LABELS), logit(BASELINE), dtype=np.float32)
+    weights = np.zeros((FEATURE_DIM, len(LABELS)), dtype=np.float32)
+
+    # A lone keyword should land on (about) its lexicon score
+    for word, scores in model.toxic_keywords.items():
+        row = hash_bucket(word)
+        for label, score in scores.items():
+            col = LABELS.index(label)
+            weights[row, col] = max(weights[row, col], logit(score) - bias[col])
+
+    for word in model.context_reducers - set(model.toxic_keywords):
+        weights[hash_bucket(word)] += CONTEXT_WEIGHT
+    for word in model.negation_words:
+        weights[hash_bucket(word)] += NEGATION_WEIGHT
+    return weights, bias
+
+
+def build(path: str):
+    weights, bias = build_weights(ToxicityModel())
+
+    graph = helper.make_graph(
+        [
+            helper.make_node("MatMul", ["features", "W"], ["xw"]),
+            helper.make_node("Add", ["xw", "b"], ["logits"]),
+            helper.make_node("Sigmoid", ["logits"], ["probs"]),
+        ],
+        "tiny_toxicity",
+        [helper.make_tensor_value_info("features", TensorProto.FLOAT, ["batch", FEATURE_DIM])],
+        [helper.make_tensor_value_info("probs", TensorProto.FLOAT, ["batch", len(LABELS)])],
+        initializer=[numpy_helper.from_array(weights, "W"), numpy_helper.from_array(bias, "b")],
+    )
+    onnx_model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)],
+                                   producer_name="build_tiny_model")
+    onnx_model.ir_version = 8  # loadable by older onnxruntime releases too
+    helper.set_model_props(onnx_model, {
+        "feature_dim": str(FEATURE_DIM),
+        "labels": ",".join(LABELS),
+    })
+    onnx.checker.check_model(onnx_model)
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    onnx.save(onnx_model, path)
+    print(f"Wrote {path} ({os.path.getsize(path)} bytes)")
+
+
+if __name__ == "__main__":
+    build(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_ONNX_MODEL)
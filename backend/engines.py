@@ -0,0 +1,260 @@
+import asyncio
+import os
+import re
+import time
+import zlib
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+from model import LABELS, ScoreResult, ToxicityModel
+
+# ── Scoring engines ──────────────────────────────────────────────────────────
+#
+# The API talks to a ScoringEngine rather than to ToxicityModel directly.
+#   lexicon → the keyword/phrase heuristic in model.py (cheap, always on)
+#   onnx    → a small CPU classifier run through ONNX Runtime, with dynamic
+#             batching (optional dependency: onnxruntime + numpy)
+#   cascade → lexicon first, classifier only for texts in the uncertain band
+#
+# Every engine returns a ScoreResult, like ToxicityModel.predict; the API
+# turns it into {"risk_score", "labels", "highlights"} when responding.
+
+FEATURE_DIM = 2048  # default hashed bag-of-words width for classifier inputs
+
+DEFAULT_ONNX_MODEL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models", "tiny_toxicity.onnx")
+
+
+def hash_bucket(word: str, dim: int = FEATURE_DIM) -> int:
+    # crc32 is stable across processes (unlike hash()), so models built
+    # offline see the same buckets as the server
+    return zlib.crc32(word.encode("utf-8")) % dim
+
+
+def feature_buckets(text: str, dim: int = FEATURE_DIM) -> List[int]:
+    return sorted({hash_bucket(w, dim) for w in re.findall(r'\b\w+\b', text.lower())})
+
+
+class EngineStats:
+    def __init__(self):
+        self.calls = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, ms: float):
+        self.calls += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def snapshot(self) -> dict:
+        return {
+            "calls": self.calls,
+            "avg_latency_ms": round(self.total_ms / self.calls, 3) if self.calls else 0.0,
+            "max_latency_ms": round(self.max_ms, 3),
+        }
+
+
+class ScoringEngine(ABC):
+    name = "base"
+
+    def __init__(self):
+        self.stats = EngineStats()
+
+    async def predict(self, text: str, trace=None) -> ScoreResult:
+        # `trace` (explain.ExplainTrace) is filled in by the lexicon stage
+        start = time.perf_counter()
+        try:
+            return await self._predict(text, trace)
+        finally:
+            self.stats.record((time.perf_counter() - start) * 1000)
+
+    @abstractmethod
+    async def _predict(self, text: str, trace=None) -> ScoreResult:
+        ...
+
+    def describe(self) -> dict:
+        return {"engine": self.name, **self.stats.snapshot()}
+
+
+# ── Lexicon engine ───────────────────────────────────────────────────────────
+
+class LexiconEngine(ScoringEngine):
+    name = "lexicon"
+
+    def __init__(self, model: Optional[ToxicityModel] = None):
+        super().__init__()
+        self.model = model or ToxicityModel()
+
+    async def _predict(self, text: str, trace=None) -> ScoreResult:
+        return await self.model.predict(text, trace)
+
+
+# ── ONNX Runtime CPU engine ──────────────────────────────────────────────────
+
+class OnnxEngine(ScoringEngine):
+    """Hashed bag-of-words classifier: float32 features[N, dim] → probs[N, 5]."""
+
+    name = "onnx"
+
+    def __init__(self, model_path: str = DEFAULT_ONNX_MODEL, threads: int = 1,
+                 max_batch: int = 32, max_wait_ms: float = 2.0):
+        super().__init__()
+        try:
+            import numpy as np
+            import onnxruntime as ort
+        except ImportError as e:
+            raise RuntimeError("The onnx engine needs `pip install onnxruntime numpy`") from e
+
+        self._np = np
+        opts = ort.SessionOptions()
+        opts.intra_op_num_threads = threads
+        opts.inter_op_num_threads = 1
+        opts.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        self.session = ort.InferenceSession(model_path, sess_options=opts, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+        meta = self.session.get_modelmeta().custom_metadata_map
+        self.feature_dim = int(meta.get("feature_dim", FEATURE_DIM))
+        labels = meta["labels"].split(",") if "labels" in meta else list(LABELS)
+        self.label_order = [labels.index(label) for label in LABELS]  # model column per LABELS entry
+
+        self.model_path = model_path
+        self.threads = threads
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        # One inference thread: ORT parallelism comes from intra_op threads
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="onnx")
+        self._queue: Optional[asyncio.Queue] = None
+        self._batcher: Optional[asyncio.Task] = None
+
+        self.batches = 0
+        self.batched_items = 0
+
+    def run_batch(self, texts: List[str]) -> List[ScoreResult]:
+        """Synchronous batched inference (used by the batcher and offline tools)."""
+        np = self._np
+        x = np.zeros((len(texts), self.feature_dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            x[row, feature_buckets(text, self.feature_dim)] = 1.0
+        probs = self.session.run(None, {self.input_name: x})[0]
+        return [self._to_result(p) for p in probs.tolist()]
+
+    def _to_result(self, row: List[float]) -> ScoreResult:
+        probs = [round(min(1.0, max(0.0, row[col])), 4) for col in self.label_order]
+        return ScoreResult(round(max(probs) * 100, 2), probs)
+
+    async def _predict(self, text: str, trace=None) -> ScoreResult:
+        # No lexicon rules to trace; the API refuses explain for this engine
+        loop = asyncio.get_running_loop()
+        if self._batcher is None or self._batcher.done() or self._batcher.get_loop() is not loop:
+            self._queue = asyncio.Queue()
+            self._batcher = asyncio.create_task(self._batch_loop())
+        fut = loop.create_future()
+        await self._queue.put((text, fut))
+        return await fut
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch: List[Tuple[str, asyncio.Future]] = [await self._queue.get()]
+            # Collect whatever else arrives within the batching window
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            texts = [t for t, _ in batch]
+            try:
+                results = await loop.run_in_executor(self._executor, self.run_batch, texts)
+            except Exception as e:
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+                continue
+            self.batches += 1
+            self.batched_items += len(batch)
+            for (_, fut), res in zip(batch, results):
+                if not fut.done():
+                    fut.set_result(res)
+
+    def describe(self) -> dict:
+        return {
+            **super().describe(),
+            "model_path": self.model_path,
+            "threads": self.threads,
+            "max_batch": self.max_batch,
+            "avg_batch_size": round(self.batched_items / self.batches, 2) if self.batches else 0.0,
+        }
+
+
+# ── Cascade engine ───────────────────────────────────────────────────────────
+
+class CascadeEngine(ScoringEngine):
+    """Cheap engine first; escalate to the expensive one only when unsure."""
+
+    name = "cascade"
+
+    def __init__(self, fast: ScoringEngine, slow: ScoringEngine,
+                 low: float = 25.0, high: float = 75.0):
+        super().__init__()
+        self.fast = fast
+        self.slow = slow
+        self.low = low      # risk band (0-100) considered uncertain
+        self.high = high
+        self.escalations = 0
+
+    async def _predict(self, text: str, trace=None) -> ScoreResult:
+        result = await self.fast.predict(text, trace)
+        if not (self.low <= result.risk_score <= self.high):
+            return result
+
+        self.escalations += 1
+        refined = await self.slow.predict(text)
+        # Classifier decides the scores; the lexicon still explains them
+        served = ScoreResult(refined.risk_score, refined.probs, result.highlight_bits, result.vocab)
+        if trace is not None:
+            trace.rescored(self.slow.name, served)
+        return served
+
+    def describe(self) -> dict:
+        calls = self.stats.calls
+        return {
+            **super().describe(),
+            "uncertain_band": [self.low, self.high],
+            "escalations": self.escalations,
+            "escalation_rate": round(self.escalations / calls, 4) if calls else 0.0,
+            "stages": [self.fast.describe(), self.slow.describe()],
+        }
+
+
+ENGINE_KINDS = ("lexicon", "onnx", "cascade")
+
+
+def build_engine(model: Optional[ToxicityModel] = None) -> ScoringEngine:
+    """Engine selected by SCORING_ENGINE = lexicon (default) | onnx | cascade."""
+    kind = os.environ.get("SCORING_ENGINE", "lexicon").lower()
+    # Check before building anything, so a typo isn't reported as a missing
+    # onnxruntime or model file
+    if kind not in ENGINE_KINDS:
+        raise ValueError(f"Unknown SCORING_ENGINE: {kind!r} (expected one of {', '.join(ENGINE_KINDS)})")
+    if kind == "lexicon":
+        return LexiconEngine(model)
+
+    onnx = OnnxEngine(
+        model_path=os.environ.get("ONNX_MODEL_PATH", DEFAULT_ONNX_MODEL),
+        threads=int(os.environ.get("ONNX_THREADS", "1")),
+        max_batch=int(os.environ.get("ONNX_MAX_BATCH", "32")),
+        max_wait_ms=float(os.environ.get("ONNX_MAX_WAIT_MS", "2")),
+    )
+    if kind == "onnx":
+        return onnx
+    return CascadeEngine(
+        LexiconEngine(model), onnx,
+        low=float(os.environ.get("CASCADE_LOW", "25")),
+        high=float(os.environ.get("CASCADE_HIGH", "75")),
+    )
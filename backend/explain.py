@@ -0,0 +1,294 @@
+"""Explain mode for ToxicityModel: per-request match trace + stage timings.
+
+As a library, pass an ExplainTrace into ToxicityModel.analyze/predict:
+
+    trace = ExplainTrace()
+    result = model.analyze(text, trace)
+    trace.to_dict()   # matches, factors, per-label winners, stage timings (ns)
+
+As a CLI, replay a corpus in explain mode and rank the slowest inputs/rules:
+
+    python -m explain corpus.txt [--top 10] [--repeat 20] [--json report.json]
+
+Corpus: .txt (one text per line) or .ndjson/.jsonl (bare strings, or
+objects with a text field as in batch_score). Lines that aren't valid JSON
+are skipped and counted as malformed_lines; items without text are skipped.
+"""
+import argparse
+import json
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, Iterator, List, Optional
+
+from model import ScoreResult, ToxicityModel
+from textsource import text_from_item
+from tokenizer import tokenize
+
+
+class ExplainTrace:
+    def __init__(self):
+        self.text = ""
+        self.matches: List[dict] = []
+        self.stages_ns: Dict[str, int] = {}
+        self.total_ns = 0
+        self.context_words: List[str] = []
+        self.context_multiplier = 1.0
+        self.winners: Dict[str, dict] = {}
+        self.lexicon_risk_score: Optional[float] = None
+        self.scored_by = "lexicon"      # engine whose scores the caller gets
+        self._start = 0
+        self._last = 0
+
+    # ── Hooks called by ToxicityModel.analyze ────────────────────────────────
+
+    def begin(self, now_ns: int, text: str):
+        self.text = text
+        self._start = self._last = now_ns
+
+    def mark(self, stage: str, now_ns: int):
+        self.stages_ns[stage] = now_ns - self._last
+        self._last = now_ns
+
+    def context(self, context_words, multiplier: float):
+        self.context_words = sorted(context_words)
+        self.context_multiplier = multiplier
+
+    def keyword(self, word, position, negations, negation_factor, local_context, local_multiplier, label_scores):
+        scores = {label: round(s * negation_factor * local_multiplier, 4) for label, s in label_scores.items()}
+        self.matches.append({
+            "rule": "keyword",
+            "term": word,
+            "position": position,
+            "negations": sorted(negations),
+            "negation_factor": negation_factor,
+            "local_context": sorted(local_context),
+            "context_multiplier": local_multiplier,
+            "raw_scores": dict(label_scores),
+            "scores": {label: s for label, s in scores.items() if s > 0.15},
+            "dropped": [label for label, s in scores.items() if s <= 0.15],
+        })
+
+    def proximity(self, word, position, person_nouns, score, skipped=None, blockers=()):
+        entry = {
+            "rule": "proximity",
+            "term": word,
+            "position": position,
+            "person_nouns": sorted(person_nouns),
+            "scores": {"Insult": round(score, 4)} if score is not None else {},
+        }
+        if skipped:
+            entry["skipped"] = skipped
+            entry["blockers"] = sorted(blockers)
+        self.matches.append(entry)
+
+    def phrase(self, phrase, char_offset, negations, factor, context_multiplier, label_scores):
+        scores = {label: round(s * factor * context_multiplier, 4) for label, s in label_scores.items()}
+        self.matches.append({
+            "rule": "phrase",
+            "term": phrase,
+            "char_offset": char_offset,
+            "position": self._token_position(char_offset),
+            "negations": sorted(negations),
+            "negation_factor": factor,
+            "context_multiplier": context_multiplier,
+            "raw_scores": dict(label_scores),
+            "scores": {label: s for label, s in scores.items() if s > 0.15},
+            "dropped": [label for label, s in scores.items() if s <= 0.15],
+        })
+
+    def sarcasm(self, phrase, char_offset, label_score, risk_contribution):
+        self.matches.append({
+            "rule": "sarcasm",
+            "term": phrase,
+            "char_offset": char_offset,
+            "position": self._token_position(char_offset),
+            "scores": {"Sarcasm": label_score},
+            "risk_contribution": risk_contribution,
+        })
+
+    def finish(self, result: ScoreResult):
+        # Winners report the served label value; for a baseline label that
+        # includes the length noise
+        self.total_ns = self._last - self._start
+        self.lexicon_risk_score = result.risk_score
+        for label, value in result.labels().items():
+            best = None
+            for idx, m in enumerate(self.matches):
+                s = m["scores"].get(label)
+                if s is not None and (best is None or s > best[0]):
+                    best = (s, idx)
+            if best is None:
+                self.winners[label] = {"rule": "baseline", "score": value}
+            else:
+                m = self.matches[best[1]]
+                self.winners[label] = {"rule": m["rule"], "term": m["term"],
+                                       "position": m["position"], "score": value, "match": best[1]}
+
+    # ── Hook called by CascadeEngine ─────────────────────────────────────────
+
+    def rescored(self, engine_name: str, result: ScoreResult):
+        # Scores and labels now come from another engine; the lexicon
+        # matches still explain the highlights and the escalation
+        self.scored_by = engine_name
+        self.winners = {label: {"rule": "classifier", "score": value}
+                        for label, value in result.labels().items()}
+
+    # ── Helpers ──────────────────────────────────────────────────────────────
+
+    def _token_position(self, char_offset: int) -> int:
+        return len(tokenize(self.text.lower()[:char_offset]))
+
+    def to_dict(self) -> dict:
+        return {
+            "scored_by": self.scored_by,
+            "lexicon_risk_score": self.lexicon_risk_score,
+            "matches": self.matches,
+            "context_words": self.context_words,
+            "context_multiplier": self.context_multiplier,
+            "winners": self.winners,
+            "stages_ns": self.stages_ns,
+            "total_ns": self.total_ns,
+        }
+
+
+# ── Per-rule cost profiling (CLI only, never on the request path) ────────────
+
+def profile_rules(model: ToxicityModel, text: str, repeat: int = 20) -> Dict[str, float]:
+    """Average ns per evaluation of each rule against `text`."""
+    lower_text = text.lower()
+    words = model.lexicon_tokens(lower_text)
+    costs: Dict[str, float] = {}
+    clock = time.perf_counter_ns
+
+    for phrase, _ in model.toxic_phrases:
+        t0 = clock()
+        for _ in range(repeat):
+            phrase in lower_text
+        costs[f"phrase:{phrase}"] = (clock() - t0) / repeat
+    for phrase in model.sarcasm_keywords:
+        t0 = clock()
+        for _ in range(repeat):
+            phrase in lower_text
+        costs[f"sarcasm:{phrase}"] = (clock() - t0) / repeat
+
+    # Dictionary probes are per token, so cost them per lexicon table
+    for name, table in (("keyword-lookup", model.toxic_keywords),
+                        ("derogatory-lookup", model.DEROGATORY_WORDS),
+                        ("safe-word-lookup", model.absolute_safe_words)):
+        t0 = clock()
+        for _ in range(repeat):
+            for w in words:
+                w in table
+        costs[name] = (clock() - t0) / repeat
+    return costs
+
+
+# ── Corpus replay ────────────────────────────────────────────────────────────
+
+def read_corpus(path: str) -> Iterator[Optional[str]]:
+    # Yields None for a line that isn't valid JSON, like batch_score.read_ndjson
+    stream = sys.stdin if path == "-" else open(path, encoding="utf-8", errors="ignore")
+    ndjson = path.endswith((".ndjson", ".jsonl"))
+    with stream:
+        for line in stream:
+            line = line.strip()
+            if not line:
+                continue
+            if ndjson:
+                try:
+                    item = json.loads(line)
+                except ValueError:
+                    yield None
+                    continue
+                line = text_from_item(item) or ""
+            if line:
+                yield line
+
+
+def replay(texts, top: int, repeat: int) -> dict:
+    model = ToxicityModel()
+    rows = []
+    stage_totals: Dict[str, int] = defaultdict(int)
+    rule_totals: Dict[str, float] = defaultdict(float)
+    rule_fires: Dict[str, int] = defaultdict(int)
+    malformed = 0
+
+    for text in texts:
+        if text is None:
+            malformed += 1
+            continue
+        idx = len(rows)
+        trace = ExplainTrace()
+        result = model.analyze(text, trace)
+        for stage, ns in trace.stages_ns.items():
+            stage_totals[stage] += ns
+        for m in trace.matches:
+            if m["scores"]:
+                rule_fires[f'{m["rule"]}:{m["term"]}'] += 1
+        for rule, ns in profile_rules(model, text, repeat).items():
+            rule_totals[rule] += ns
+        slowest = max(trace.stages_ns, key=trace.stages_ns.get)
+        rows.append({
+            "index": idx,
+            "text": text[:80],
+            "total_ns": trace.total_ns,
+            "slowest_stage": slowest,
+            "risk_score": result.risk_score,
+            "matches": len(trace.matches),
+        })
+
+    rows.sort(key=lambda r: r["total_ns"], reverse=True)
+    return {
+        "inputs": len(rows),
+        "malformed_lines": malformed,
+        "slowest_inputs": rows[:top],
+        "stages_ns": dict(sorted(stage_totals.items(), key=lambda kv: kv[1], reverse=True)),
+        "slowest_rules_ns": dict(sorted(rule_totals.items(), key=lambda kv: kv[1], reverse=True)[:top]),
+        "most_fired_rules": dict(sorted(rule_fires.items(), key=lambda kv: kv[1], reverse=True)[:top]),
+    }
+
+
+def print_report(report: dict):
+    print(f"Replayed {report['inputs']} inputs in explain mode")
+    if report["malformed_lines"]:
+        print(f"Skipped {report['malformed_lines']} malformed lines")
+    print()
+
+    print("Slowest inputs")
+    print(f"  {'total µs':>9}  {'stage':<10} {'risk':>6} {'hits':>4}  text")
+    for r in report["slowest_inputs"]:
+        print(f"  {r['total_ns'] / 1000:>9.1f}  {r['slowest_stage']:<10} {r['risk_score']:>6.1f} "
+              f"{r['matches']:>4}  {r['text']!r}")
+
+    total = sum(report["stages_ns"].values()) or 1
+    print("\nTime per stage")
+    for stage, ns in report["stages_ns"].items():
+        print(f"  {stage:<10} {ns / 1e6:>10.3f} ms  {ns / total * 100:5.1f}%")
+
+    print("\nSlowest rules (summed over corpus)")
+    for rule, ns in report["slowest_rules_ns"].items():
+        print(f"  {ns / 1e3:>10.1f} µs  {rule}")
+
+    print("\nMost fired rules")
+    for rule, n in report["most_fired_rules"].items():
+        print(f"  {n:>8}  {rule}")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Replay a corpus through ToxicityModel in explain mode")
+    parser.add_argument("corpus", help=".txt, .ndjson/.jsonl, or - for stdin")
+    parser.add_argument("--top", type=int, default=10, help="rows per ranking (default 10)")
+    parser.add_argument("--repeat", type=int, default=20, help="timing repetitions per rule (default 20)")
+    parser.add_argument("--json", metavar="PATH", help="also write the full report as JSON")
+    args = parser.parse_args(argv)
+
+    report = replay(read_corpus(args.corpus), args.top, args.repeat)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,18 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
 from pydantic import BaseModel
 from typing import List, Optional
 import time
-import asyncio
 import io
 import csv
 import json
 from model import ToxicityModel
+from engines import build_engine
+from prefilter import LexiconBloom
+from explain import ExplainTrace
+from textsource import pick_text_column, text_from_item
+from scheduler import build_scheduler, Overloaded, JobTooLarge, INTERACTIVE, BATCH
 
 app = FastAPI(title="Social Media & Abuse Detection API")
 
@@ -20,18 +25,45 @@ app.add_middleware(
 )
 
 ai_model = ToxicityModel()
+engine = build_engine(ai_model)   # SCORING_ENGINE=lexicon|onnx|cascade
+lexicon_filter = LexiconBloom.from_model(ai_model)
+
+# Interactive keystroke analysis is served ahead of bulk/file jobs; bulk work
+# is capped to a slice of the shared budget so it can't starve the text box.
+# Budgets are read from SCHED_* env vars (see scheduler.build_scheduler).
+scheduler = build_scheduler()
+
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": exc.detail},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@app.exception_handler(JobTooLarge)
+async def job_too_large_handler(request: Request, exc: JobTooLarge):
+    return JSONResponse(status_code=413, content={"detail": exc.detail, "max_items": exc.limit})
+
+
+def client_id(request: Request) -> str:
+    return request.client.host if request.client else "anonymous"
 
 # ── Models ───────────────────────────────────────────────────────────────────
 
 class AnalyzeRequest(BaseModel):
     text: str
     threshold: Optional[float] = 0.3  # sensitivity threshold
+    explain: bool = False             # include a rule/timing trace (lexicon/cascade engines)
 
 class AnalyzeResponse(BaseModel):
     risk_score: float
     labels: dict
     highlights: list
     processing_time_ms: float
+    trace: Optional[dict] = None
 
 class BulkAnalyzeRequest(BaseModel):
     texts: List[str]
@@ -56,56 +88,69 @@ class BulkAnalyzeResponse(BaseModel):
 
 # ── Single text analysis ─────────────────────────────────────────────────────
 
-@app.post("/analyze", response_model=AnalyzeResponse)
-async def analyze_text(req: AnalyzeRequest):
+@app.post("/analyze", response_model=AnalyzeResponse, response_model_exclude_none=True)
+async def analyze_text(req: AnalyzeRequest, request: Request):
     start_time = time.time()
-    result = await ai_model.predict(req.text)
+    trace = None
+    if req.explain:
+        # The trace records the lexicon rules; a bare classifier has none
+        if engine.name == "onnx":
+            raise HTTPException(status_code=400, detail="explain is not available with the onnx engine")
+        trace = ExplainTrace()
+    result = await scheduler.run(INTERACTIVE, client_id(request), engine.predict, req.text, trace)
     processing_time_ms = (time.time() - start_time) * 1000
     return AnalyzeResponse(
-        risk_score=result["risk_score"],
-        labels=result["labels"],
-        highlights=result["highlights"],
+        risk_score=result.risk_score,
+        labels=result.labels(),
+        highlights=result.highlights(),
         processing_time_ms=processing_time_ms,
+        trace=trace.to_dict() if trace is not None else None,
     )
 
 # ── Bulk text analysis ───────────────────────────────────────────────────────
 
+def bulk_response(texts: List[str], results: list, threshold: float, start_time: float) -> JSONResponse:
+    # Results stay compact ScoreResults until here; rows are built straight
+    # into the JSON payload (shape of BulkAnalyzeResponse) without a
+    # per-row pydantic object
+    toxic_count = 0
+    risk_total = 0.0
+    rows = []
+    for i, (text, res) in enumerate(zip(texts, results)):
+        is_toxic = res.is_toxic(threshold)
+        toxic_count += is_toxic
+        risk_total += res.risk_score
+        rows.append({
+            "index": i,
+            "text": text[:200],        # truncate for response size
+            "risk_score": res.risk_score,
+            "labels": res.labels(),
+            "highlights": res.highlights(),
+            "is_toxic": is_toxic,
+        })
+
+    return JSONResponse(content={
+        "results": rows,
+        "total": len(rows),
+        "toxic_count": toxic_count,
+        "safe_count": len(rows) - toxic_count,
+        "avg_risk_score": round(risk_total / len(rows), 2) if rows else 0,
+        "processing_time_ms": round((time.time() - start_time) * 1000, 2),
+    })
+
+
 @app.post("/analyze-bulk", response_model=BulkAnalyzeResponse)
-async def analyze_bulk(req: BulkAnalyzeRequest):
+async def analyze_bulk(req: BulkAnalyzeRequest, request: Request):
     start_time = time.time()
 
-    # Run all in parallel (asyncio.gather)
-    tasks = [ai_model.predict(t) for t in req.texts]
-    raw_results = await asyncio.gather(*tasks)
-
-    results = []
-    for i, (text, res) in enumerate(zip(req.texts, raw_results)):
-        is_toxic = res["risk_score"] > (req.threshold * 100)
-        results.append(BulkResult(
-            index=i,
-            text=text[:200],        # truncate for response size
-            risk_score=res["risk_score"],
-            labels=res["labels"],
-            highlights=res["highlights"],
-            is_toxic=is_toxic,
-        ))
-
-    toxic_count = sum(1 for r in results if r.is_toxic)
-    avg_risk = sum(r.risk_score for r in results) / len(results) if results else 0
-
-    return BulkAnalyzeResponse(
-        results=results,
-        total=len(results),
-        toxic_count=toxic_count,
-        safe_count=len(results) - toxic_count,
-        avg_risk_score=round(avg_risk, 2),
-        processing_time_ms=round((time.time() - start_time) * 1000, 2),
-    )
+    # Bounded fan-out through the batch class (admitted or rejected as a whole)
+    raw_results = await scheduler.map(BATCH, client_id(request), engine.predict, req.texts)
+    return bulk_response(req.texts, raw_results, req.threshold, start_time)
 
 # ── File upload analysis ─────────────────────────────────────────────────────
 
 @app.post("/analyze-file")
-async def analyze_file(file: UploadFile = File(...), threshold: float = 0.3):
+async def analyze_file(request: Request, file: UploadFile = File(...), threshold: float = 0.3):
     start_time = time.time()
     content = await file.read()
 
@@ -121,18 +166,9 @@ async def analyze_file(file: UploadFile = File(...), threshold: float = 0.3):
     elif filename.endswith(".csv"):
         decoded = content.decode("utf-8", errors="ignore")
         reader = csv.DictReader(io.StringIO(decoded))
-        text_col = None
         rows = list(reader)
         if rows:
-            # Prefer column named: text, message, content, comment, tweet, post, body
-            preferred = ["text", "message", "content", "comment", "tweet", "post", "body", "description"]
-            headers = [h.lower() for h in rows[0].keys()]
-            for pref in preferred:
-                if pref in headers:
-                    text_col = list(rows[0].keys())[[h.lower() for h in rows[0].keys()].index(pref)]
-                    break
-            if not text_col:
-                text_col = list(rows[0].keys())[0]  # fallback: first column
+            text_col = pick_text_column(list(rows[0].keys()))
             texts = [row.get(text_col, "").strip() for row in rows if row.get(text_col, "").strip()]
 
     # ── JSON: array of strings or objects with text field ──
@@ -140,13 +176,9 @@ async def analyze_file(file: UploadFile = File(...), threshold: float = 0.3):
         data = json.loads(content.decode("utf-8", errors="ignore"))
         if isinstance(data, list):
             for item in data:
-                if isinstance(item, str):
-                    texts.append(item.strip())
-                elif isinstance(item, dict):
-                    for key in ["text", "message", "content", "comment", "body"]:
-                        if key in item and isinstance(item[key], str):
-                            texts.append(item[key].strip())
-                            break
+                text = text_from_item(item)
+                if text is not None:
+                    texts.append(text)
         elif isinstance(data, dict):
             for key in ["text", "message", "content", "texts", "messages"]:
                 if key in data:
@@ -166,32 +198,8 @@ async def analyze_file(file: UploadFile = File(...), threshold: float = 0.3):
     texts = texts[:500]
 
     # Run bulk analysis
-    tasks = [ai_model.predict(t) for t in texts]
-    raw_results = await asyncio.gather(*tasks)
-
-    results = []
-    for i, (text, res) in enumerate(zip(texts, raw_results)):
-        is_toxic = res["risk_score"] > (threshold * 100)
-        results.append(BulkResult(
-            index=i,
-            text=text[:200],
-            risk_score=res["risk_score"],
-            labels=res["labels"],
-            highlights=res["highlights"],
-            is_toxic=is_toxic,
-        ))
-
-    toxic_count = sum(1 for r in results if r.is_toxic)
-    avg_risk = sum(r.risk_score for r in results) / len(results) if results else 0
-
-    return BulkAnalyzeResponse(
-        results=results,
-        total=len(results),
-        toxic_count=toxic_count,
-        safe_count=len(results) - toxic_count,
-        avg_risk_score=round(avg_risk, 2),
-        processing_time_ms=round((time.time() - start_time) * 1000, 2),
-    )
+    raw_results = await scheduler.map(BATCH, client_id(request), engine.predict, texts)
+    return bulk_response(texts, raw_results, threshold, start_time)
 
 
 # ── Health check ─────────────────────────────────────────────────────────────
@@ -201,5 +209,42 @@ async def health():
     return {
         "status": "ok",
         "model": "ToxicityModel v2",
-        "endpoints": ["/analyze", "/analyze-bulk", "/analyze-file"],
+        "engine": engine.name,
+        "lexicon_version": lexicon_filter.version,
+        "endpoints": ["/analyze", "/analyze-bulk", "/analyze-file", "/scheduler", "/engine", "/lexicon/bloom"],
     }
+
+
+# ── Scheduler stats ──────────────────────────────────────────────────────────
+
+@app.get("/scheduler")
+async def scheduler_stats():
+    return scheduler.stats()
+
+
+# ── Engine stats ─────────────────────────────────────────────────────────────
+
+@app.get("/engine")
+async def engine_stats():
+    return engine.describe()
+
+
+# ── Lexicon pre-filter export ────────────────────────────────────────────────
+
+@app.get("/lexicon/bloom")
+async def lexicon_bloom(request: Request, v: Optional[str] = None):
+    # Only the lexicon decides whether clean text scores; a bare classifier
+    # can flag text with no lexicon term, so clients must not skip calls
+    if engine.name == "onnx":
+        raise HTTPException(status_code=404, detail="Lexicon pre-filter is not available for the onnx engine")
+
+    etag = f'"{lexicon_filter.version}"'
+    if v == lexicon_filter.version:
+        cache = "public, max-age=31536000, immutable"   # versioned URL never changes
+    else:
+        cache = "public, max-age=3600, must-revalidate"
+    headers = {"ETag": etag, "Cache-Control": cache}
+
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(content=lexicon_filter.export(), headers=headers)
@@ -1,9 +1,14 @@
 import asyncio
-import re
+import heapq
+import struct
+import time
+from typing import List
+
+from tokenizer import lexicon_words, tokenize
 
 class ToxicityModel:
     def __init__(self):
-        self.labels = ["Threat", "Hate Speech", "Insult", "Obscenity", "Sarcasm"]
+        self.labels = list(LABELS)
 
         # Comprehensive toxic keyword dictionary
         self.toxic_keywords = {
@@ -440,12 +445,46 @@ class ToxicityModel:
             "against", "without", "instead", "refuse", "deny",
         }
 
+        # ── Compiled lookups for analyze() ──────────────────────────────────
+        # Highlight vocabulary: every word a rule can highlight, minus words
+        # that are never shown (safe words / context reducers)
+        label_index = {label: i for i, label in enumerate(LABELS)}
+        candidates = set(self.toxic_keywords) | self.DEROGATORY_WORDS
+        for phrase, _ in self.toxic_phrases:
+            candidates.update(phrase.split())
+        for phrase in self.sarcasm_keywords:
+            candidates.update(phrase.split())
+        self.highlight_vocab = tuple(sorted(candidates - self.absolute_safe_words - self.context_reducers))
+        self.highlight_ids = {w: i for i, w in enumerate(self.highlight_vocab)}
+
+        def phrase_bits(phrase):
+            bits = 0
+            for w in phrase.split():
+                if w in self.highlight_ids:
+                    bits |= 1 << self.highlight_ids[w]
+            return bits
+
+        self._keyword_scores = {
+            word: tuple((label_index[label], score) for label, score in scores.items())
+            for word, scores in self.toxic_keywords.items()
+        }
+        self._phrase_rules = [
+            (phrase, tuple((label_index[label], score) for label, score in scores.items()), phrase_bits(phrase), scores)
+            for phrase, scores in self.toxic_phrases
+        ]
+        self._sarcasm_rules = [(phrase, phrase_bits(phrase)) for phrase in self.sarcasm_keywords]
+        # Contractions the rules know as whole words; any other clitic is cut off
+        self._whole_contractions = frozenset(w for w in self.negation_words | self.PERSON_NOUNS if "'" in w)
+
     # Person-referencing nouns/pronouns — when near a derogatory word, amplify score
     PERSON_NOUNS = {
         "you", "your", "he", "she", "they", "him", "her", "them",
         "person", "human", "being", "people", "guy", "girl", "man",
         "woman", "kid", "child", "everyone", "somebody", "someone",
         "anyone", "nobody", "no one", "this person", "that person",
+        # Contracted forms (kept whole by lexicon_tokens)
+        "you're", "you've", "you'll", "you'd", "he's", "he'd", "she's", "she'd",
+        "they're", "they've", "they'll", "they'd",
     }
 
     # Derogatory adjectives/nouns that become highly toxic when aimed at a person
@@ -473,26 +512,50 @@ class ToxicityModel:
         "embarrassing", "shameful", "ridiculous", "absurd", "mockery",
     }
 
-    async def predict(self, text: str):
+    def lexicon_tokens(self, lower_text: str) -> List[str]:
+        """Tokens the rules look up, from already-lowercased text.
+
+        Hashtags score like the bare word ("#loser" -> "loser"); @mentions are
+        handles, not words. Negation and pronoun contractions stay whole
+        ("don't", "you're"); any other clitic is cut off, so possessives
+        still match ("idiot's" -> "idiot").
+        """
+        return lexicon_words(lower_text, self._whole_contractions)
+
+    async def predict(self, text: str, trace=None):
         # Simulate network/compute delay (~50ms)
         await asyncio.sleep(0.05)
+        return self.analyze(text, trace)
+
+    def analyze(self, text: str, trace=None) -> "ScoreResult":
+        # `trace` (explain.ExplainTrace) records matches and stage timings;
+        # every hook is behind `if trace is not None` so the normal path
+        # only pays for a few pointer comparisons
+        if trace is not None:
+            trace.begin(time.perf_counter_ns(), text)
 
         lower_text = text.lower()
-        words = re.findall(r'\b\w+\b', lower_text)
+        words = self.lexicon_tokens(lower_text)
         word_set = set(words)
+        if trace is not None:
+            trace.mark("tokenize", time.perf_counter_ns())
 
-        # Base probabilities — very low baseline
-        probs = {label: 0.03 for label in self.labels}
-        highlights = []
-        all_scores = []
+        # Base probabilities — very low baseline (indexed like LABELS)
+        probs = list(_BASELINE_PROBS)
+        highlight_ids = self.highlight_ids
+        highlight_bits = 0
+        top3 = []   # min-heap of the 3 best scores seen so far
 
         # ── Safety pre-check: is text entirely safe? ───────────────────────
         # Check if context reducers are present (gaming, news, medical, fiction)
         context_words_present = word_set & self.context_reducers
         context_multiplier = 0.45 if context_words_present else 1.0
+        if trace is not None:
+            trace.context(context_words_present, context_multiplier)
 
         # ── 1. Single-word keyword matching ────────────────────────────────
         NEG_WINDOW = 3  # words before a toxic word to check for negation
+        kw_counts = {}  # highlight occurrences per keyword (a kept label adds, a dropped one removes)
         for i, word in enumerate(words):
             # Skip words that are in the absolute safe list
             if word in self.absolute_safe_words:
@@ -509,17 +572,28 @@ class ToxicityModel:
                 local_context = local_window & self.context_reducers
                 local_multiplier = 0.30 if local_context else context_multiplier
 
-                highlights.append(word)
-                for label, score in self.toxic_keywords[word].items():
+                count = kw_counts.get(word, 0) + 1
+                for idx, score in self._keyword_scores[word]:
                     adjusted = score * negation_factor * local_multiplier
                     # Only flag if adjusted score is meaningful (> 15%)
                     if adjusted > 0.15:
-                        probs[label] = max(probs[label], adjusted)
-                        all_scores.append(adjusted)
-                    else:
-                        # Remove from highlights if score is too low
-                        if word in highlights:
-                            highlights.remove(word)
+                        if adjusted > probs[idx]:
+                            probs[idx] = adjusted
+                        _push_top3(top3, adjusted)
+                    elif count:
+                        # Drop from highlights if score is too low
+                        count -= 1
+                kw_counts[word] = count
+                if trace is not None:
+                    trace.keyword(word, i, pre_window & self.negation_words, negation_factor,
+                                  local_context, local_multiplier, self.toxic_keywords[word])
+
+        for word, count in kw_counts.items():
+            if count and word in highlight_ids:
+                highlight_bits |= 1 << highlight_ids[word]
+
+        if trace is not None:
+            trace.mark("keywords", time.perf_counter_ns())
 
         # ── 1b. Proximity combo detection ──────────────────────────────────
         WINDOW = 4
@@ -533,6 +607,9 @@ class ToxicityModel:
 
                 # Skip if strong context reducer is nearby
                 if nearby & self.context_reducers:
+                    if trace is not None:
+                        trace.proximity(word, i, nearby & self.PERSON_NOUNS, None, "context",
+                                        nearby & self.context_reducers)
                     continue
 
                 # Check negation
@@ -542,57 +619,135 @@ class ToxicityModel:
                 if nearby & self.PERSON_NOUNS and not is_negated:
                     combo_score = self.toxic_keywords.get(word, {}).get("Insult", 0.75)
                     combo_score = max(combo_score, 0.75)
-                    probs["Insult"] = max(probs["Insult"], combo_score)
-                    all_scores.append(combo_score)
-                    if word not in highlights:
-                        highlights.append(word)
+                    if combo_score > probs[_INSULT]:
+                        probs[_INSULT] = combo_score
+                    _push_top3(top3, combo_score)
+                    if word in highlight_ids:
+                        highlight_bits |= 1 << highlight_ids[word]
+                    if trace is not None:
+                        trace.proximity(word, i, nearby & self.PERSON_NOUNS, combo_score)
+                elif trace is not None:
+                    trace.proximity(word, i, nearby & self.PERSON_NOUNS, None,
+                                    "negated" if is_negated else "no_person_noun",
+                                    pre_window & self.negation_words)
+
+        if trace is not None:
+            trace.mark("proximity", time.perf_counter_ns())
 
         # ── 2. Multi-word phrase matching ───────────────────────────────────
-        for phrase, label_scores in self.toxic_phrases:
+        for phrase, label_scores, phrase_bits, raw_scores in self._phrase_rules:
             if phrase in lower_text:
                 # Check negation at phrase start
                 phrase_start_idx = lower_text.find(phrase)
-                pre_text_words = re.findall(r'\b\w+\b', lower_text[:phrase_start_idx])[-3:]
+                pre_text_words = tokenize(lower_text[:phrase_start_idx])[-3:]
                 is_negated = bool(set(pre_text_words) & self.negation_words)
                 factor = 0.25 if is_negated else 1.0
                 local_ctx = context_multiplier
 
-                phrase_words = phrase.split()
-                highlights.extend(phrase_words)
-                for label, score in label_scores.items():
+                highlight_bits |= phrase_bits
+                for idx, score in label_scores:
                     adjusted = score * factor * local_ctx
                     if adjusted > 0.15:
-                        probs[label] = max(probs[label], adjusted)
-                        all_scores.append(adjusted)
+                        if adjusted > probs[idx]:
+                            probs[idx] = adjusted
+                        _push_top3(top3, adjusted)
+                if trace is not None:
+                    trace.phrase(phrase, phrase_start_idx, set(pre_text_words) & self.negation_words,
+                                 factor, local_ctx, raw_scores)
+
+        if trace is not None:
+            trace.mark("phrases", time.perf_counter_ns())
 
         # ── 3. Sarcasm detection ────────────────────────────────────────────
-        for phrase in self.sarcasm_keywords:
+        for phrase, phrase_bits in self._sarcasm_rules:
             if phrase in lower_text:
-                probs["Sarcasm"] = max(probs["Sarcasm"], 0.85)
-                all_scores.append(0.75)
-                highlights.extend(phrase.split())
+                if 0.85 > probs[_SARCASM]:
+                    probs[_SARCASM] = 0.85
+                _push_top3(top3, 0.75)
+                highlight_bits |= phrase_bits
+                if trace is not None:
+                    trace.sarcasm(phrase, lower_text.find(phrase), 0.85, 0.75)
+
+        if trace is not None:
+            trace.mark("sarcasm", time.perf_counter_ns())
 
         # ── 4. Risk score: blend of max score and top-3 average ────────────
-        if all_scores:
-            max_score = max(all_scores)
-            top3_avg = sum(sorted(all_scores, reverse=True)[:3]) / min(3, len(all_scores))
-            risk_score = (0.7 * max_score + 0.3 * top3_avg) * 100
+        if top3:
+            best = sorted(top3, reverse=True)
+            top3_avg = sum(best) / len(best)
+            risk_score = (0.7 * best[0] + 0.3 * top3_avg) * 100
         else:
             risk_score = 2.0  # near-zero for clean text
 
         # ── 5. Add slight noise to untouched baseline labels ───────────────
-        for label in probs:
-            if probs[label] <= 0.03:
-                probs[label] += (len(text) % 7) * 0.005
-            probs[label] = round(min(1.0, probs[label]), 4)
-
-        # ── 6. Clean up highlights — remove safe/negated words ────────────
-        highlights = [h for h in highlights
-                      if h not in self.absolute_safe_words
-                      and h not in self.context_reducers]
-
+        noise = (len(text) % 7) * 0.005
+        for idx in range(len(probs)):
+            p = probs[idx]
+            if p <= 0.03:
+                p += noise
+            probs[idx] = round(min(1.0, p), 4)
+
+        # ── 6. Highlights: safe/context words never get a vocabulary id ────
+        result = ScoreResult(round(risk_score, 2), probs, highlight_bits, self.highlight_vocab)
+        if trace is not None:
+            trace.mark("finalize", time.perf_counter_ns())
+            trace.finish(result)
+        return result
+
+
+def _push_top3(heap, score):
+    if len(heap) < 3:
+        heapq.heappush(heap, score)
+    elif score > heap[0]:
+        heapq.heapreplace(heap, score)
+
+
+# ── Compact result ───────────────────────────────────────────────────────────
+#
+# Bulk jobs keep one result per row alive until the response is written, so
+# results are kept small: the five label probabilities are packed into a
+# 40-byte bytes object (ordered like LABELS) and highlights are an int bitset
+# over the model's highlight vocabulary. Neither is tracked by the cyclic GC,
+# leaving one tracked object per result. Dicts/lists are only built at the
+# response boundary via to_dict().
+
+LABELS = ("Threat", "Hate Speech", "Insult", "Obscenity", "Sarcasm")
+_INSULT = LABELS.index("Insult")
+_SARCASM = LABELS.index("Sarcasm")
+_BASELINE_PROBS = [0.03] * len(LABELS)
+_PROBS = struct.Struct(f"{len(LABELS)}d")
+
+
+class ScoreResult:
+    __slots__ = ("risk_score", "_probs", "highlight_bits", "vocab")
+
+    def __init__(self, risk_score: float, probs, highlight_bits: int = 0, vocab=()):
+        self.risk_score = risk_score
+        self._probs = _PROBS.pack(*probs)       # label probabilities, ordered like LABELS
+        self.highlight_bits = highlight_bits    # bit i set → vocab[i] highlighted
+        self.vocab = vocab                      # shared tuple, owned by the model
+
+    @property
+    def probs(self) -> tuple:
+        return _PROBS.unpack(self._probs)
+
+    def labels(self) -> dict:
+        return dict(zip(LABELS, _PROBS.unpack(self._probs)))
+
+    def highlights(self) -> list:
+        bits, out = self.highlight_bits, []
+        while bits:
+            low = bits & -bits
+            out.append(self.vocab[low.bit_length() - 1])
+            bits ^= low
+        return out
+
+    def is_toxic(self, threshold: float) -> bool:
+        return self.risk_score > threshold * 100
+
+    def to_dict(self) -> dict:
         return {
-            "risk_score": round(risk_score, 2),
-            "labels": probs,
-            "highlights": list(set(highlights))
+            "risk_score": self.risk_score,
+            "labels": self.labels(),
+            "highlights": self.highlights(),
         }
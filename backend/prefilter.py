@@ -0,0 +1,151 @@
+import base64
+import hashlib
+import math
+import re
+from typing import Iterable, List
+
+from model import ToxicityModel
+
+# ── Client-side lexicon pre-filter ───────────────────────────────────────────
+#
+# A Bloom filter over every lexicon term that can raise a score. The model
+# matches two kinds of rule, and the filter mirrors each one:
+#   - keywords and derogatory words match whole tokens. They are stored
+#     normalised to lowercase \w+ tokens joined by single spaces, and the
+#     frontend probes every token n-gram up to max_ngram.
+#   - toxic phrases and sarcasm phrases match as substrings of the lowercased
+#     text ("sure" fires inside "pressure"). For each one the filter stores
+#     SHINGLE_PREFIX + its first SHINGLE_MAX characters, and the frontend
+#     probes every window of the lowercased text with one of the lengths in
+#     substring_lengths. If a phrase occurs, so does its prefix. The marker
+#     keeps windows from hitting word terms ("hang" inside "change").
+#
+# The frontend calls /analyze only when a probe hits. A Bloom filter has no
+# false negatives, so a skipped text really does score the clean baseline.
+# A false positive only costs one extra server call, but a text makes about
+# len(substring_lengths) probes per character plus max_ngram per token, so
+# the per-probe rate is kept far below the per-text rate we can live with.
+# The export publishes both the per-probe rate and a per-character estimate
+# (a text of L characters is a false positive with about 1 - (1 - r)^L).
+#
+# Hashing (must match frontend/src/prefilter.ts):
+#   h1 = FNV-1a 32-bit of the UTF-8 term, offset basis 0x811C9DC5
+#   h2 = FNV-1a 32-bit of the UTF-8 term, offset basis 0x9747B28C, | 1
+#   bit_i = ((h1 + i * h2) mod 2^32) mod m        for i in 0..k-1
+#   bit j lives in byte j >> 3, mask 1 << (j & 7)
+
+FORMAT = "bloom-fnv1a-v3"
+TARGET_FPR = 1e-6     # per probe
+CHARS_PER_TOKEN = 6   # typical English token plus separator, for the per-char estimate
+FNV_PRIME = 0x01000193
+SEED_1 = 0x811C9DC5
+SEED_2 = 0x9747B28C
+SHINGLE_MAX = 8       # characters kept per substring rule
+SHINGLE_PREFIX = "|"  # never part of a normalised word term
+
+_TOKEN_RE = re.compile(r'\w+')
+
+
+def normalize(term: str) -> str:
+    return " ".join(_TOKEN_RE.findall(term.lower()))
+
+
+def fnv1a(data: bytes, seed: int) -> int:
+    h = seed
+    for b in data:
+        h = ((h ^ b) * FNV_PRIME) & 0xFFFFFFFF
+    return h
+
+
+def lexicon_terms(model: ToxicityModel) -> List[str]:
+    # Single words in absolute_safe_words are skipped by the model, so they
+    # never need a server round trip
+    words = (set(model.toxic_keywords) | model.DEROGATORY_WORDS) - model.absolute_safe_words
+    terms = {normalize(t) for t in words}
+    terms.discard("")
+    return sorted(terms)
+
+
+def substring_rules(model: ToxicityModel) -> List[str]:
+    """Phrases the model looks for with `phrase in text.lower()`."""
+    phrases = {p for p, _ in model.toxic_phrases} | set(model.sarcasm_keywords)
+    phrases.discard("")
+    return sorted(phrases)
+
+
+class LexiconBloom:
+    def __init__(self, terms: Iterable[str], substrings: Iterable[str] = (),
+                 target_fpr: float = TARGET_FPR):
+        terms = sorted(set(terms))
+        shingles = sorted({p[:SHINGLE_MAX] for p in substrings})
+        keys = sorted(set(terms) | {SHINGLE_PREFIX + p for p in shingles})
+        n = max(1, len(keys))
+        m = math.ceil(-n * math.log(target_fpr) / (math.log(2) ** 2))
+        self.m = (m + 7) // 8 * 8          # whole bytes
+        self.k = max(1, round(self.m / n * math.log(2)))
+        self.n = len(keys)
+        self.max_ngram = max((t.count(" ") + 1 for t in terms), default=1)
+        self.substring_lengths = sorted({len(p) for p in shingles})
+        self.fpr = (1 - math.exp(-self.k * n / self.m)) ** self.k
+        probes_per_char = len(self.substring_lengths) + self.max_ngram / CHARS_PER_TOKEN
+        self.char_fpr = 1 - (1 - self.fpr) ** probes_per_char
+
+        self.bits = bytearray(self.m // 8)
+        for key in keys:
+            for j in self._positions(key):
+                self.bits[j >> 3] |= 1 << (j & 7)
+
+        digest = hashlib.sha256()
+        digest.update(f"{FORMAT}:{self.m}:{self.k}:{self.substring_lengths}\n".encode())
+        for key in keys:
+            digest.update(key.encode("utf-8") + b"\n")
+        self.version = digest.hexdigest()[:16]
+        self._export = None
+
+    @classmethod
+    def from_model(cls, model: ToxicityModel, target_fpr: float = TARGET_FPR) -> "LexiconBloom":
+        return cls(lexicon_terms(model), substring_rules(model), target_fpr)
+
+    def _positions(self, term: str):
+        data = term.encode("utf-8")
+        h1 = fnv1a(data, SEED_1)
+        h2 = fnv1a(data, SEED_2) | 1
+        return [((h1 + i * h2) & 0xFFFFFFFF) % self.m for i in range(self.k)]
+
+    def _has(self, key: str) -> bool:
+        return all(self.bits[j >> 3] & (1 << (j & 7)) for j in self._positions(key))
+
+    def __contains__(self, term: str) -> bool:
+        return self._has(normalize(term))
+
+    def might_match(self, text: str) -> bool:
+        """Server-side twin of the frontend check: could any lexicon rule fire on `text`?"""
+        lower_text = text.lower()
+        tokens = _TOKEN_RE.findall(lower_text)
+        for i in range(len(tokens)):
+            for size in range(1, min(self.max_ngram, len(tokens) - i) + 1):
+                if self._has(" ".join(tokens[i:i + size])):
+                    return True
+        for size in self.substring_lengths:
+            for i in range(len(lower_text) - size + 1):
+                if self._has(SHINGLE_PREFIX + lower_text[i:i + size]):
+                    return True
+        return False
+
+    def export(self) -> dict:
+        if self._export is None:
+            self._export = {
+                "version": self.version,
+                "format": FORMAT,
+                "seeds": [SEED_1, SEED_2],
+                "m": self.m,
+                "k": self.k,
+                "n": self.n,
+                "max_ngram": self.max_ngram,
+                "substring_lengths": self.substring_lengths,
+                "substring_prefix": SHINGLE_PREFIX,
+                "probe_false_positive_rate": float(f"{self.fpr:.3g}"),
+                "char_false_positive_rate": float(f"{self.char_fpr:.3g}"),
+                "bits": base64.b64encode(bytes(self.bits)).decode("ascii"),
+            }
+        return self._export
@@ -0,0 +1,293 @@
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+# ── Admission control & priority scheduling ──────────────────────────────────
+#
+# Every call into the model goes through a Scheduler. Work is split into
+# classes (interactive keystroke analysis vs. bulk/file jobs), each with:
+#   - its own concurrency budget (max items in flight at once), carved out of
+#     a shared total. This is not a CPU budget: an in-flight item mostly
+#     waits (the model's simulated 50 ms latency) and the actual scoring
+#     runs one item at a time on the event loop. The cap bounds how much
+#     waiting work a class can hold, so it also bounds batch throughput
+#     (max_concurrency / per-item latency)
+#   - its own bounded queue (items admitted but still waiting for a slot)
+#   - a per-client token bucket
+# Interactive waiters always win a free slot over batch waiters, and a batch
+# job is fanned out through a fixed pool of workers instead of one giant
+# asyncio.gather, so one big upload can't starve the live text box.
+#
+# When a class is saturated the scheduler refuses the work up-front with
+# Overloaded (mapped to 429 / 503 + Retry-After by the API layer). A job
+# bigger than a class could ever admit (more items than its burst or queue)
+# is refused with JobTooLarge instead (413), since retrying can't help.
+#
+# Budgets come from the environment (see build_scheduler), so they can be
+# tuned from the GET /scheduler numbers without a code change.
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+
+
+class Overloaded(Exception):
+    def __init__(self, status_code: int, detail: str, retry_after: float):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = max(1, int(retry_after + 0.999))  # whole seconds, rounded up
+
+
+class JobTooLarge(Exception):
+    def __init__(self, class_name: str, count: int, limit: int):
+        super().__init__(f"{class_name} jobs are limited to {limit} items, got {count}")
+        self.detail = str(self)
+        self.limit = limit
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate            # tokens refilled per second
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self, cost: float = 1.0) -> float:
+        """Take `cost` tokens. Returns 0 on success, else seconds until it would succeed."""
+        now = time.monotonic()
+        self._refill(now)
+        if cost > self.capacity:
+            # Request can never fit — report the time to refill a full bucket
+            return self.capacity / self.rate
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+
+class WorkClass:
+    def __init__(self, name: str, priority: int, max_concurrency: int, max_queue: int,
+                 rate: float, burst: float):
+        self.name = name
+        self.priority = priority            # lower value = served first
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.rate = rate                    # per-client tokens/sec (1 token = 1 text)
+        self.burst = burst
+        self.max_job = int(min(burst, max_queue))   # largest job that can ever be admitted
+
+        self.running = 0
+        self.queued = 0                     # admitted items not yet running
+        self.waiters: deque = deque()
+        self.buckets: Dict[str, TokenBucket] = {}
+
+        # Stats
+        self.completed = 0
+        self.rejected_rate = 0
+        self.rejected_overload = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.service_total = 0.0
+
+    def bucket(self, client: str) -> TokenBucket:
+        b = self.buckets.get(client)
+        if b is None:
+            if len(self.buckets) > 10_000:
+                # Drop idle, fully refilled buckets so the map stays bounded
+                now = time.monotonic()
+                for key in [k for k, v in self.buckets.items()
+                            if v.tokens + (now - v.updated) * v.rate >= v.capacity]:
+                    del self.buckets[key]
+            b = self.buckets[client] = TokenBucket(self.rate, self.burst)
+        return b
+
+    def snapshot(self) -> dict:
+        return {
+            "running": self.running,
+            "queue_depth": self.queued,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "max_job": self.max_job,
+            "completed": self.completed,
+            "rejected_rate_limited": self.rejected_rate,
+            "rejected_overloaded": self.rejected_overload,
+            "avg_wait_ms": round(self.wait_total / self.completed * 1000, 2) if self.completed else 0.0,
+            "max_wait_ms": round(self.wait_max * 1000, 2),
+            "avg_service_ms": round(self.service_total / self.completed * 1000, 2) if self.completed else 0.0,
+        }
+
+
+class Scheduler:
+    def __init__(self, classes: Iterable[WorkClass], max_total: int):
+        self.classes: Dict[str, WorkClass] = {c.name: c for c in classes}
+        self._by_priority: List[WorkClass] = sorted(self.classes.values(), key=lambda c: c.priority)
+        self.max_total = max_total      # shared budget across all classes
+        self.running_total = 0
+
+    # ── Admission ────────────────────────────────────────────────────────────
+
+    def admit(self, class_name: str, client: str, count: int = 1):
+        """Reserve queue space for `count` items, or raise JobTooLarge / Overloaded."""
+        wc = self.classes[class_name]
+        if count > wc.max_job:
+            raise JobTooLarge(wc.name, count, wc.max_job)
+
+        # Queue check first, so a 503 doesn't also spend the client's tokens
+        if wc.queued + count > wc.max_queue:
+            wc.rejected_overload += 1
+            # Rough drain estimate: queued work / throughput of the class
+            per_item = (wc.service_total / wc.completed) if wc.completed else 0.05
+            retry = (wc.queued + count) * per_item / max(1, wc.max_concurrency)
+            raise Overloaded(503, f"Server busy: {wc.name} queue is full", retry)
+
+        wait = wc.bucket(client).try_take(count)
+        if wait:
+            wc.rejected_rate += 1
+            raise Overloaded(429, f"Rate limit exceeded for {wc.name} requests", wait)
+
+        wc.queued += count
+
+    def release_unstarted(self, class_name: str, count: int):
+        """Give back queue space for admitted items that will never run."""
+        self.classes[class_name].queued -= count
+
+    # ── Slot handling ────────────────────────────────────────────────────────
+
+    def _has_slot(self, wc: WorkClass) -> bool:
+        return wc.running < wc.max_concurrency and self.running_total < self.max_total
+
+    def _higher_priority_waiting(self, wc: WorkClass) -> bool:
+        for other in self._by_priority:
+            if other is wc:
+                return False
+            if other.waiters and self._has_slot(other):
+                return True
+        return False
+
+    def _take_slot(self, wc: WorkClass):
+        wc.running += 1
+        self.running_total += 1
+
+    async def _acquire(self, wc: WorkClass):
+        if not wc.waiters and self._has_slot(wc) and not self._higher_priority_waiting(wc):
+            self._take_slot(wc)
+            return
+        fut = asyncio.get_running_loop().create_future()
+        wc.waiters.append(fut)
+        try:
+            await fut       # slot is handed over already counted
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                self._release(wc)
+            else:
+                try:
+                    wc.waiters.remove(fut)
+                except ValueError:
+                    pass
+            raise
+
+    def _release(self, wc: WorkClass):
+        wc.running -= 1
+        self.running_total -= 1
+        # Hand freed slots to waiters in priority order
+        for c in self._by_priority:
+            while c.waiters and self._has_slot(c):
+                fut = c.waiters.popleft()
+                if not fut.done():
+                    self._take_slot(c)
+                    fut.set_result(None)
+
+    async def _run_admitted(self, wc: WorkClass, fn: Callable[..., Awaitable[Any]], *args):
+        enqueued = time.monotonic()
+        try:
+            await self._acquire(wc)
+        finally:
+            wc.queued -= 1
+        started = time.monotonic()
+        try:
+            return await fn(*args)
+        finally:
+            done = time.monotonic()
+            waited = started - enqueued
+            wc.completed += 1
+            wc.wait_total += waited
+            wc.wait_max = max(wc.wait_max, waited)
+            wc.service_total += done - started
+            self._release(wc)
+
+    # ── Public API ───────────────────────────────────────────────────────────
+
+    async def run(self, class_name: str, client: str, fn: Callable[..., Awaitable[Any]], *args):
+        """Admit and run a single unit of work."""
+        self.admit(class_name, client, 1)
+        return await self._run_admitted(self.classes[class_name], fn, *args)
+
+    async def map(self, class_name: str, client: str, fn: Callable[[Any], Awaitable[Any]],
+                  items: List[Any]) -> List[Any]:
+        """Admit a whole job, then run it through at most max_concurrency workers."""
+        n = len(items)
+        if n == 0:
+            return []
+        self.admit(class_name, client, n)
+        wc = self.classes[class_name]
+
+        results: List[Optional[Any]] = [None] * n
+        next_idx = 0
+
+        async def worker():
+            nonlocal next_idx
+            while next_idx < n:
+                i = next_idx
+                next_idx += 1
+                results[i] = await self._run_admitted(wc, fn, items[i])
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(min(n, wc.max_concurrency))]
+        try:
+            await asyncio.gather(*workers)
+        except BaseException:
+            for w in workers:
+                w.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            raise
+        finally:
+            # Items never picked up (error/cancel) still hold queue space
+            if next_idx < n:
+                self.release_unstarted(class_name, n - next_idx)
+        return results
+
+    def stats(self) -> dict:
+        return {
+            "running_total": self.running_total,
+            "max_total": self.max_total,
+            "classes": {name: wc.snapshot() for name, wc in self.classes.items()},
+        }
+
+
+# Defaults: (priority, max_concurrency, max_queue, rate, burst)
+DEFAULT_CLASSES = {
+    INTERACTIVE: (0, 64, 256, 20, 40),
+    BATCH:       (1, 16, 2000, 200, 1000),
+}
+DEFAULT_MAX_TOTAL = 64
+
+
+def build_scheduler() -> Scheduler:
+    """Scheduler with budgets from SCHED_MAX_TOTAL and, per class,
+    SCHED_<CLASS>_CONCURRENCY / _QUEUE / _RATE / _BURST (e.g. SCHED_BATCH_CONCURRENCY)."""
+    classes = []
+    for name, (priority, concurrency, queue, rate, burst) in DEFAULT_CLASSES.items():
+        prefix = f"SCHED_{name.upper()}_"
+        classes.append(WorkClass(
+            name, priority=priority,
+            max_concurrency=int(os.environ.get(prefix + "CONCURRENCY", concurrency)),
+            max_queue=int(os.environ.get(prefix + "QUEUE", queue)),
+            rate=float(os.environ.get(prefix + "RATE", rate)),
+            burst=float(os.environ.get(prefix + "BURST", burst)),
+        ))
+    return Scheduler(classes, max_total=int(os.environ.get("SCHED_MAX_TOTAL", DEFAULT_MAX_TOTAL)))
@@ -0,0 +1,88 @@
+import json
+
+import pytest
+
+import batch_score
+
+
+def write_ndjson(path, lines):
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+def run(tmp_path, *extra, name="in.ndjson"):
+    out = tmp_path / "out.ndjson"
+    batch_score.main([str(tmp_path / name), "-o", str(out), "--workers", "1",
+                      "--chunk-size", "2", *extra])
+    return [json.loads(line) for line in out.read_text(encoding="utf-8").splitlines()]
+
+
+def test_malformed_ndjson_lines_are_skipped_and_counted(tmp_path, capsys):
+    write_ndjson(tmp_path / "in.ndjson", [
+        '{"text": "hello friend"}',
+        '{"text": "you are an idiot"',          # truncated
+        '"nobody cares"',
+        "not json at all",
+        '{"text": "great job team"}',
+        '{"text": "shut up"}',
+    ])
+    rows = run(tmp_path)
+    assert [r["text"] for r in rows] == ["hello friend", "nobody cares", "great job team", "shut up"]
+    assert [r["index"] for r in rows] == [0, 1, 2, 3]
+
+    summary = json.loads(capsys.readouterr().out.strip().splitlines()[-1])
+    assert summary["total"] == 4
+    assert summary["malformed_rows"] == 2
+
+
+def test_oversize_csv_field_is_skipped_and_counted(tmp_path, capsys):
+    huge = "x" * 200_000                       # over csv.field_size_limit()
+    (tmp_path / "in.csv").write_text(
+        "id,text\n"
+        "1,hello friend\n"
+        f'2,"{huge}"\n'
+        '3,"you are an idiot"\n'
+        "4,nobody cares\n",
+        encoding="utf-8",
+    )
+    rows = run(tmp_path, name="in.csv")
+    assert [r["text"] for r in rows] == ["hello friend", "you are an idiot", "nobody cares"]
+
+    summary = json.loads(capsys.readouterr().out.strip().splitlines()[-1])
+    assert summary["total"] == 3
+    assert summary["malformed_rows"] == 1
+
+
+def test_resume_with_other_format_is_refused(tmp_path):
+    write_ndjson(tmp_path / "in.ndjson", ['{"text": "row %d"}' % i for i in range(3)])
+    run(tmp_path)
+    ckpt_path = tmp_path / "out.ndjson.ckpt"
+    ckpt = json.loads(ckpt_path.read_text())
+    assert ckpt["format"] == "ndjson"
+    ckpt["done"] = False
+    ckpt_path.write_text(json.dumps(ckpt))
+    with pytest.raises(SystemExit, match="format"):
+        run(tmp_path, "--format", "txt")
+
+
+def test_resume_after_malformed_line_finishes(tmp_path, capsys):
+    lines = ['{"text": "row %d"}' % i for i in range(6)]
+    lines.insert(3, "{broken")
+    write_ndjson(tmp_path / "in.ndjson", lines)
+    full = run(tmp_path)
+
+    # Pretend the first run stopped after the first chunk
+    ckpt_path = tmp_path / "out.ndjson.ckpt"
+    ckpt = json.loads(ckpt_path.read_text())
+    first_line_end = len((lines[0] + "\n" + lines[1] + "\n").encode())
+    first_chunk = (json.dumps(full[0], ensure_ascii=False, separators=(",", ":")) + "\n"
+                   + json.dumps(full[1], ensure_ascii=False, separators=(",", ":")) + "\n").encode()
+    ckpt.update(input_offset=first_line_end, rows_done=2, output_bytes=len(first_chunk),
+                toxic_count=sum(r["is_toxic"] for r in full[:2]),
+                risk_total=sum(r["risk_score"] for r in full[:2]), malformed_rows=0, done=False)
+    ckpt_path.write_text(json.dumps(ckpt))
+    capsys.readouterr()
+
+    assert run(tmp_path) == full
+    summary = json.loads(capsys.readouterr().out.strip().splitlines()[-1])
+    assert summary["total"] == 6
+    assert summary["malformed_rows"] == 1
@@ -0,0 +1,107 @@
+import asyncio
+import os
+
+import pytest
+
+import engines
+from engines import DEFAULT_ONNX_MODEL, CascadeEngine, OnnxEngine, ScoringEngine, build_engine
+from model import ToxicityModel
+
+pytest.importorskip("numpy")
+pytest.importorskip("onnxruntime")
+
+TEXTS = [
+    "hello friend, great game",     # clean
+    "you are an idiot",             # clearly toxic
+    "this game is trash",
+    "I will kill the boss",
+    "shut up",
+    "nobody cares",
+    "yeah right genius",
+]
+
+
+class InstantLexicon(ScoringEngine):
+    """Lexicon scores without the simulated 50 ms delay of ToxicityModel.predict."""
+
+    name = "lexicon"
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    async def _predict(self, text, trace=None):
+        return self.model.analyze(text, trace)
+
+
+def same(a, b):
+    return (a.risk_score, a.probs, a.highlights()) == (b.risk_score, b.probs, b.highlights())
+
+
+def test_scoring_engine_is_abstract():
+    with pytest.raises(TypeError):
+        ScoringEngine()
+
+
+def test_build_engine_rejects_unknown_kind_before_building(monkeypatch):
+    def no_onnx(**kwargs):
+        raise AssertionError("OnnxEngine built for an unknown kind")
+
+    monkeypatch.setattr(engines, "OnnxEngine", no_onnx)
+    monkeypatch.setenv("SCORING_ENGINE", "onxx")
+    with pytest.raises(ValueError, match="'onxx'"):
+        build_engine()
+
+
+def test_cascade_with_bundled_tiny_model():
+    assert os.path.exists(DEFAULT_ONNX_MODEL)
+    model = ToxicityModel()
+    fast = InstantLexicon(model)
+    slow = OnnxEngine(max_wait_ms=0)
+    cascade = CascadeEngine(fast, slow, low=25.0, high=75.0)
+
+    async def score():
+        return [await cascade.predict(t) for t in TEXTS]
+
+    results = asyncio.run(score())
+
+    expected_escalations = 0
+    for text, res in zip(TEXTS, results):
+        lex = model.analyze(text)
+        if 25.0 <= lex.risk_score <= 75.0:
+            expected_escalations += 1
+            onnx = slow.run_batch([text])[0]
+            assert (res.risk_score, res.probs) == (onnx.risk_score, onnx.probs)
+            assert res.highlights() == lex.highlights()     # lexicon still explains it
+        else:
+            assert same(res, lex)                           # passes through unchanged
+
+    assert 0 < expected_escalations < len(TEXTS)
+    assert cascade.escalations == expected_escalations
+    info = cascade.describe()
+    assert info["calls"] == len(TEXTS)
+    assert info["escalation_rate"] == round(expected_escalations / len(TEXTS), 4)
+    assert slow.stats.calls == expected_escalations
+
+
+def test_cascade_explain_trace_follows_the_served_scores():
+    from explain import ExplainTrace
+
+    model = ToxicityModel()
+    cascade = CascadeEngine(InstantLexicon(model), OnnxEngine(max_wait_ms=0), low=25.0, high=75.0)
+
+    async def explain(text):
+        trace = ExplainTrace()
+        return await cascade.predict(text, trace), trace
+
+    for text in TEXTS:
+        res, trace = asyncio.run(explain(text))
+        plain = asyncio.run(cascade.predict(text))
+        assert same(res, plain)                 # explain never changes the answer
+        lex = model.analyze(text)
+        assert trace.lexicon_risk_score == lex.risk_score
+        escalated = 25.0 <= lex.risk_score <= 75.0
+        assert trace.scored_by == ("onnx" if escalated else "lexicon")
+        assert {label: w["score"] for label, w in trace.winners.items()} == res.labels()
+        if escalated:
+            assert {w["rule"] for w in trace.winners.values()} == {"classifier"}
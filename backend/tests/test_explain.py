@@ -0,0 +1,46 @@
+import pytest
+
+pytest.importorskip("fastapi")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import main  # noqa: E402
+from explain import ExplainTrace, read_corpus, replay  # noqa: E402
+from model import ToxicityModel  # noqa: E402
+
+client = TestClient(main.app)
+
+
+def test_explain_returns_the_engine_scores():
+    text = "you are an idiot, nobody cares"
+    plain = client.post("/analyze", json={"text": text}).json()
+    explained = client.post("/analyze", json={"text": text, "explain": True}).json()
+    for key in ("risk_score", "labels", "highlights"):
+        assert explained[key] == plain[key]
+    trace = explained["trace"]
+    assert trace["scored_by"] == main.engine.name
+    assert trace["lexicon_risk_score"] == plain["risk_score"]
+    assert {m["term"] for m in trace["matches"]} >= {"idiot", "nobody cares"}
+    assert "trace" not in plain
+
+
+def test_explain_refused_for_classifier_only_engine(monkeypatch):
+    monkeypatch.setattr(main.engine, "name", "onnx")
+    resp = client.post("/analyze", json={"text": "hello", "explain": True})
+    assert resp.status_code == 400
+
+
+@pytest.mark.parametrize("text", ["hello there", "hello there!", "you are an idiot, nobody cares"])
+def test_winners_report_the_served_label_values(text):
+    trace = ExplainTrace()
+    result = ToxicityModel().analyze(text, trace)
+    assert {label: w["score"] for label, w in trace.winners.items()} == result.labels()
+
+
+def test_read_corpus_skips_and_counts_malformed_lines(tmp_path):
+    corpus = tmp_path / "corpus.ndjson"
+    corpus.write_text('"you idiot"\n{"text": \n42\nnull\n{"message": "hello"}\n{"id": 1}\n', encoding="utf-8")
+    assert list(read_corpus(str(corpus))) == ["you idiot", None, "hello"]
+    report = replay(read_corpus(str(corpus)), top=5, repeat=1)
+    assert report["inputs"] == 2
+    assert report["malformed_lines"] == 1
@@ -0,0 +1,30 @@
+import pytest
+
+from model import ToxicityModel
+
+MODEL = ToxicityModel()
+
+
+@pytest.mark.parametrize("text, risk, highlights", [
+    # Possessives and other clitics still match the lexicon word
+    ("you loser's", 82.0, ["loser"]),
+    ("that idiot's opinion is wrong", 79.5, ["idiot"]),
+    ("stupid idiot's", 82.0, ["idiot", "stupid"]),
+    ("your mom's a loser", 82.0, ["loser"]),
+    # Negation and pronoun contractions stay whole
+    ("I don't want to kill you", 2.0, []),
+    ("you're an idiot", 83.0, ["idiot"]),
+    ("you’re an idiot", 83.0, ["idiot"]),
+    # Hashtags score like the word; mentions are handles
+    ("#loser", 82.0, ["loser"]),
+    ("@idiot hi", 2.0, []),
+])
+def test_lexicon_tokens_regressions(text, risk, highlights):
+    res = MODEL.analyze(text)
+    assert res.risk_score == risk
+    assert res.highlights() == highlights
+
+
+def test_lexicon_tokens():
+    assert MODEL.lexicon_tokens("don't call the #idiot's @bot, you're") == \
+        ["don't", "call", "the", "idiot", "@bot", "you're"]
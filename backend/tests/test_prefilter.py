@@ -0,0 +1,63 @@
+import random
+
+import pytest
+
+from model import ToxicityModel
+from prefilter import LexiconBloom, substring_rules
+
+MODEL = ToxicityModel()
+BLOOM = LexiconBloom.from_model(MODEL)
+
+WORDS = (
+    "please ensure the pressure is right treasure hunt was a pleasure he has if statements "
+    "hello friend nice day you idiot loser's oh wow great job genius whatever waste of space "
+    "shut up go die 😂 café Ünï #mood @someone don't can't"
+).split()
+
+
+def is_clean(text):
+    res = MODEL.analyze(text)
+    return res.risk_score == 2.0 and not res.highlights()
+
+
+@pytest.mark.parametrize("text", [
+    "please ensure the pressure is right",     # "sure" inside "pressure"
+    "the treasure hunt was a pleasure",
+    "he has if statements",                    # "as if" across a word boundary
+])
+def test_substring_phrase_hits_are_not_skipped(text):
+    assert not is_clean(text)
+    assert BLOOM.might_match(text)
+
+
+def test_skipped_texts_score_the_clean_baseline():
+    rng = random.Random(11)
+    skipped = 0
+    for _ in range(5000):
+        text = " ".join(rng.choices(WORDS, k=rng.randint(1, 10)))
+        if not BLOOM.might_match(text):
+            skipped += 1
+            assert is_clean(text), text
+    assert skipped > 0
+
+
+def test_substring_rules_are_ascii():
+    # The frontend probes UTF-16 windows; that only matches Python for ASCII
+    assert all(p.isascii() for p in substring_rules(MODEL))
+
+
+def test_substring_windows_do_not_hit_word_terms():
+    # "hang" is a keyword; inside "change" it must not count as a hit
+    assert "hang" in BLOOM
+    assert is_clean("we change the world")
+    assert not BLOOM.might_match("we change the world")
+
+
+def test_export_describes_probing():
+    data = BLOOM.export()
+    assert data["format"] == "bloom-fnv1a-v3"
+    assert data["substring_prefix"] == "|"
+    assert data["probe_false_positive_rate"] <= 1e-6 * 1.05
+    assert data["probe_false_positive_rate"] < data["char_false_positive_rate"] < 1e-5
+    assert data["substring_lengths"] == sorted(data["substring_lengths"])
+    assert max(data["substring_lengths"]) <= 8
@@ -0,0 +1,161 @@
+import asyncio
+
+import pytest
+
+from scheduler import BATCH, INTERACTIVE, JobTooLarge, Overloaded, Scheduler, WorkClass
+
+
+def make_scheduler(max_total=4, batch_queue=10, batch_burst=10):
+    return Scheduler([
+        WorkClass(INTERACTIVE, priority=0, max_concurrency=4, max_queue=10, rate=1, burst=10),
+        WorkClass(BATCH, priority=1, max_concurrency=4, max_queue=batch_queue, rate=1, burst=batch_burst),
+    ], max_total=max_total)
+
+
+def assert_idle(sched):
+    assert sched.running_total == 0
+    for wc in sched.classes.values():
+        assert wc.running == 0
+        assert wc.queued == 0
+        assert not wc.waiters
+
+
+async def echo(x):
+    await asyncio.sleep(0)
+    return x
+
+
+def test_map_returns_in_order_and_releases_everything():
+    sched = make_scheduler()
+    results = asyncio.run(sched.map(BATCH, "c", echo, list(range(8))))
+    assert results == list(range(8))
+    assert sched.classes[BATCH].completed == 8
+    assert_idle(sched)
+
+
+def test_oversize_job_rejected_without_spending_tokens():
+    sched = make_scheduler(batch_burst=5)
+    with pytest.raises(JobTooLarge) as exc:
+        sched.admit(BATCH, "c", 6)
+    assert exc.value.limit == 5
+    sched.admit(BATCH, "c", 5)          # full burst still available
+    assert sched.classes[BATCH].queued == 5
+
+
+def test_queue_full_does_not_spend_tokens():
+    sched = make_scheduler(batch_queue=10, batch_burst=10)
+    sched.admit(BATCH, "other", 8)
+    with pytest.raises(Overloaded) as exc:
+        sched.admit(BATCH, "c", 5)
+    assert exc.value.status_code == 503
+    sched.release_unstarted(BATCH, 8)
+    sched.admit(BATCH, "c", 10)         # no tokens were taken by the 503
+    assert sched.classes[BATCH].rejected_overload == 1
+    assert sched.classes[BATCH].rejected_rate == 0
+
+
+def test_rate_limit_keeps_queue_untouched():
+    sched = make_scheduler()
+    sched.admit(BATCH, "c", 10)
+    sched.release_unstarted(BATCH, 10)
+    with pytest.raises(Overloaded) as exc:
+        sched.admit(BATCH, "c", 1)
+    assert exc.value.status_code == 429
+    assert exc.value.retry_after >= 1
+    assert sched.classes[BATCH].queued == 0
+
+
+def test_interactive_waiter_gets_freed_slot_first():
+    sched = make_scheduler(max_total=1)
+    order = []
+
+    async def scenario():
+        gate = asyncio.Event()
+
+        async def hold(tag):
+            order.append(tag)
+            await gate.wait()
+
+        async def record(tag):
+            order.append(tag)
+
+        holder = asyncio.ensure_future(sched.run(BATCH, "c", hold, "holder"))
+        await asyncio.sleep(0)
+        batch = asyncio.ensure_future(sched.run(BATCH, "c", record, "batch"))
+        await asyncio.sleep(0)
+        interactive = asyncio.ensure_future(sched.run(INTERACTIVE, "c", record, "interactive"))
+        await asyncio.sleep(0)
+        assert sched.classes[BATCH].queued == 1
+        assert sched.classes[INTERACTIVE].queued == 1
+        gate.set()
+        await asyncio.gather(holder, batch, interactive)
+
+    asyncio.run(scenario())
+    assert order == ["holder", "interactive", "batch"]
+    assert_idle(sched)
+
+
+def test_cancelled_waiter_gives_back_queue_space():
+    sched = make_scheduler(max_total=1)
+
+    async def scenario():
+        gate = asyncio.Event()
+        holder = asyncio.ensure_future(sched.run(BATCH, "c", gate.wait))
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(sched.run(BATCH, "c", echo, 1))
+        await asyncio.sleep(0)
+        assert sched.classes[BATCH].queued == 1
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert sched.classes[BATCH].queued == 0
+        assert not sched.classes[BATCH].waiters
+        gate.set()
+        await holder
+
+    asyncio.run(scenario())
+    assert_idle(sched)
+
+
+def test_cancelled_map_releases_unstarted_items():
+    sched = make_scheduler(max_total=2)
+
+    async def scenario():
+        job = asyncio.ensure_future(sched.map(BATCH, "c", asyncio.sleep, [10] * 6))
+        await asyncio.sleep(0.01)
+        assert sched.running_total == 2
+        job.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await job
+
+    asyncio.run(scenario())
+    assert_idle(sched)
+
+
+def test_bulk_endpoint_rejects_oversize_job_with_413():
+    pytest.importorskip("fastapi")
+    from fastapi.testclient import TestClient
+
+    import main
+
+    limit = main.scheduler.classes[BATCH].max_job
+    resp = TestClient(main.app).post("/analyze-bulk", json={"texts": ["hi"] * (limit + 1)})
+    assert resp.status_code == 413
+    assert resp.json()["max_items"] == limit
+    assert "Retry-After" not in resp.headers
+
+
+def test_build_scheduler_reads_budgets_from_env(monkeypatch):
+    from scheduler import build_scheduler
+
+    monkeypatch.setenv("SCHED_MAX_TOTAL", "100")
+    monkeypatch.setenv("SCHED_BATCH_CONCURRENCY", "48")
+    monkeypatch.setenv("SCHED_BATCH_BURST", "300")
+    monkeypatch.setenv("SCHED_INTERACTIVE_RATE", "5")
+    sched = build_scheduler()
+    batch, interactive = sched.classes[BATCH], sched.classes[INTERACTIVE]
+    assert sched.max_total == 100
+    assert batch.max_concurrency == 48
+    assert batch.max_job == 300
+    assert interactive.rate == 5.0
+    assert interactive.max_concurrency == 64     # untouched default
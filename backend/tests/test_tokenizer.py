@@ -0,0 +1,69 @@
+import random
+import re
+
+import pytest
+
+from tokenizer import _TOKEN_RE, _lexicon_fixup, lexicon_words, tokenize, tokenize_ascii, tokenize_unicode
+
+# The token spec, written plainly (no possessive quantifiers, no shortcuts)
+SPEC = re.compile(r"(?<!\w)[#@]?\w+(?:'\w+)*")
+
+
+def fuzz(alphabet, n, seed):
+    rng = random.Random(seed)
+    for _ in range(n):
+        yield "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 24)))
+
+
+@pytest.mark.parametrize("alphabet", [
+    "ab09_ '#@.,!-?\t\n",
+    "ab '#@",        # dense sigils and apostrophes
+    "a'#@ ",
+])
+def test_ascii_fast_path_matches_regex_path(alphabet):
+    for text in fuzz(alphabet, 100_000, seed=len(alphabet)):
+        assert tokenize_ascii(text) == tokenize_unicode(text) == SPEC.findall(text), text
+
+
+def test_ascii_fast_path_lowercases():
+    assert tokenize_ascii("You're an IDIOT #Loser") == ["you're", "an", "idiot", "#loser"]
+
+
+def test_unicode_path_matches_spec():
+    for text in fuzz("aé0_ '#@.’😀я", 100_000, seed=3):
+        assert tokenize_unicode(text) == SPEC.findall(text.replace("’", "'")), text
+
+
+@pytest.mark.parametrize("text, tokens", [
+    ("don't @ me #mood", ["don't", "me", "#mood"]),
+    ("@mike_23 you’re an idiot", ["@mike_23", "you're", "an", "idiot"]),
+    ("a#b 'quoted' ##tag x'", ["a", "b", "quoted", "#tag", "x"]),
+    ("naïve café owner's", ["naïve", "café", "owner's"]),
+    ("это просто ужасно", ["это", "просто", "ужасно"]),
+    ("😡😡 you are pathetic 🤡", ["you", "are", "pathetic"]),
+])
+def test_tokens(text, tokens):
+    assert tokenize(text) == tokens
+
+
+def test_token_regex_is_the_spec():
+    for text in fuzz("ab '#@é.", 50_000, seed=9):
+        assert _TOKEN_RE.findall(text) == SPEC.findall(text), text
+
+
+WHOLE = frozenset({"don't", "you're", "a'b"})
+
+
+@pytest.mark.parametrize("alphabet", ["ab09_ '#@.,!-?", "ab '#@", "a'#@ dontyure"])
+def test_lexicon_words_fast_path_matches_fixup(alphabet):
+    for text in fuzz(alphabet, 100_000, seed=len(alphabet) + 1):
+        assert lexicon_words(text, WHOLE) == _lexicon_fixup(SPEC.findall(text), WHOLE), text
+
+
+@pytest.mark.parametrize("text, words", [
+    ("don't call the #idiot's @bot's, you're", ["don't", "call", "the", "idiot", "@bot", "you're"]),
+    ("#you're a#b's", ["you're", "a", "b"]),
+    ("you’re the idiot’s", ["you're", "the", "idiot"]),
+])
+def test_lexicon_words(text, words):
+    assert lexicon_words(text, WHOLE) == words
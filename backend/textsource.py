@@ -0,0 +1,32 @@
+from typing import List, Optional
+
+# ── Where to find the text in uploaded / offline records ─────────────────────
+# Shared by /analyze-file and the offline batch scorer so both pick the same
+# column or field from the same input.
+
+# Prefer column named: text, message, content, comment, tweet, post, body
+TEXT_COLUMNS = ["text", "message", "content", "comment", "tweet", "post", "body", "description"]
+
+# Keys tried, in order, on JSON objects
+TEXT_KEYS = ["text", "message", "content", "comment", "body"]
+
+
+def pick_text_column(fieldnames: List[str]) -> Optional[str]:
+    if not fieldnames:
+        return None
+    lowered = [h.lower() for h in fieldnames]
+    for pref in TEXT_COLUMNS:
+        if pref in lowered:
+            return fieldnames[lowered.index(pref)]
+    return fieldnames[0]  # fallback: first column
+
+
+def text_from_item(item) -> Optional[str]:
+    """A bare string, or the first text field of an object."""
+    if isinstance(item, str):
+        return item.strip()
+    if isinstance(item, dict):
+        for key in TEXT_KEYS:
+            if key in item and isinstance(item[key], str):
+                return item[key].strip()
+    return None
@@ -0,0 +1,157 @@
+import re
+import sys
+from typing import FrozenSet, List
+
+# ── Tokenizer ────────────────────────────────────────────────────────────────
+#
+# Word tokens for the lexicon rules, from already-lowercased text. Compared
+# to re.findall(r'\b\w+\b'):
+#   - contractions stay whole ("don't", "idiot's"); lexicon_words (below)
+#     decides which ones the rules look up whole
+#   - hashtags and mentions keep their sigil ("#loser", "@someone")
+#   - curly apostrophes (’) count as apostrophes
+#   - emoji and other symbols are separators, as before
+#
+# Token spec (both paths produce the same tokens for ASCII text):
+#   (?<!\w)[#@]?  \w+  ('\w+)*
+#
+# ASCII text (most traffic) takes a fast path: one bytes.translate through a
+# 256-entry table that maps every non-token character to a space (and
+# lowercases, at no extra cost), then a str.split(). If an apostrophe or
+# sigil survives, a few substring checks confirm every one sits where the
+# spec allows it; only texts that fail (a#b, 'quoted', ##tag) re-split their
+# odd tokens with the regex.
+#
+# Non-ASCII text goes through the Unicode-aware regex. The (?<!\w)
+# lookbehind only matters in front of a sigil, so texts without one use a
+# plain word regex. Possessive quantifiers (Python 3.11+) give the same
+# matches without backtracking bookkeeping, roughly halving regex time.
+
+_P = "+" if sys.version_info >= (3, 11) else ""
+_TOKEN_RE = re.compile(rf"(?<!\w)[#@]?\w+{_P}(?:'\w+{_P})*{_P}")
+_WORD_RE = re.compile(rf"\w+{_P}(?:'\w+{_P})*{_P}")
+
+_KEEP = "abcdefghijklmnopqrstuvwxyz0123456789_'#@"
+_ASCII_TABLE = bytes(
+    c if chr(c) in _KEEP else c + 32 if 65 <= c <= 90 else 32
+    for c in range(256)
+)
+_SPECIAL = frozenset("'#@")
+# In " " + translated + " ", an apostrophe is out of place next to a space,
+# another apostrophe or after a sigil; a sigil next to a space. A sigil not
+# right after a space is caught by counting.
+_BAD_APOSTROPHE = (" '", "' ", "''", "#'", "@'")
+
+
+def _well_formed(padded: str) -> bool:
+    if "'" in padded:
+        for bad in _BAD_APOSTROPHE:
+            if bad in padded:
+                return False
+    for sigil, lead, trail in (("#", " #", "# "), ("@", " @", "@ ")):
+        if sigil in padded and (trail in padded or padded.count(sigil) != padded.count(lead)):
+            return False
+    return True
+
+
+def _translate(text: str) -> str:
+    return text.encode("ascii").translate(_ASCII_TABLE).decode("ascii")
+
+
+def _clean(spaced: str) -> bool:
+    return "'" not in spaced and "#" not in spaced and "@" not in spaced
+
+
+def _resplit(tokens: List[str]) -> List[str]:
+    out: List[str] = []
+    for tok in tokens:
+        if _SPECIAL.isdisjoint(tok):
+            out.append(tok)
+        else:
+            out.extend(_TOKEN_RE.findall(tok))
+    return out
+
+
+def tokenize_ascii(text: str) -> List[str]:
+    spaced = _translate(text)
+    tokens = spaced.split()
+    if _clean(spaced) or _well_formed(f" {spaced} "):
+        return tokens
+    return _resplit(tokens)
+
+
+def tokenize_unicode(text: str) -> List[str]:
+    if "’" in text:
+        text = text.replace("’", "'")
+    if "#" in text or "@" in text:
+        return _TOKEN_RE.findall(text)
+    return _WORD_RE.findall(text)
+
+
+def tokenize(text: str) -> List[str]:
+    """Word tokens of already-lowercased `text` (see module notes for the rules).
+
+    Callers lowercase once (the model needs the lowered text anyway), so
+    neither path pays for a second str.lower().
+    """
+    if text.isascii():
+        return tokenize_ascii(text)
+    return tokenize_unicode(text)
+
+
+# ── Lexicon words ────────────────────────────────────────────────────────────
+#
+# What the lexicon rules look up (ToxicityModel.lexicon_tokens): hashtags
+# lose their sigil, and a clitic is cut off unless the whole contraction is
+# in `whole` ("don't" stays, "idiot's" -> "idiot"). On the ASCII fast path
+# both happen on the translated string before the split: " #" -> " " unwraps
+# every hashtag (well-formedness guarantees each sigil follows a space), and
+# only the tokens around each apostrophe are looked at, with str.find/rfind.
+# Other texts tokenize as above and fix up token by token.
+
+
+def _lexicon_fixup(tokens: List[str], whole: FrozenSet[str]) -> List[str]:
+    out: List[str] = []
+    for w in tokens:
+        if w[0] == "#":
+            w = w[1:]
+        if "'" in w and w not in whole:
+            w = w[:w.index("'")]
+        out.append(w)
+    return out
+
+
+def _cut_clitics(padded: str, whole: FrozenSet[str]) -> str:
+    pieces: List[str] = []
+    last = 0
+    i = padded.find("'")
+    while i != -1:
+        start = padded.rfind(" ", 0, i) + 1
+        end = padded.find(" ", i)
+        if padded[start:end] not in whole:
+            pieces.append(padded[last:i])
+            last = end
+        i = padded.find("'", end)
+    pieces.append(padded[last:])
+    return "".join(pieces)
+
+
+def lexicon_words(text: str, whole: FrozenSet[str]) -> List[str]:
+    """Lexicon words of already-lowercased `text`; `whole` lists the
+    contractions the rules know as words (see the notes above)."""
+    if not text.isascii():
+        tokens = tokenize_unicode(text)
+        if "'" not in text and "’" not in text and "#" not in text:
+            return tokens
+        return _lexicon_fixup(tokens, whole)
+    spaced = _translate(text)
+    if _clean(spaced):
+        return spaced.split()
+    padded = f" {spaced} "
+    if not _well_formed(padded):
+        return _lexicon_fixup(_resplit(padded.split()), whole)
+    if "#" in padded:
+        padded = padded.replace(" #", " ")
+    if "'" in padded:
+        padded = _cut_clitics(padded, whole)
+    return padded.split()
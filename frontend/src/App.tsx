@@ -17,8 +17,12 @@ import { SeverityBadge } from './components/SeverityBadge';
 import { FileUpload } from './components/FileUpload';
 import { SettingsPanel } from './components/SettingsPanel';
 import type { AnalyzeMetadata } from './types';
+import { syncLexiconFilter, mightBeToxic, cleanResult } from './prefilter';
+import type { LexiconFilter } from './prefilter';
 
-const API_URL = 'http://localhost:8000/analyze';
+const API_BASE = 'http://localhost:8000';
+const API_URL = `${API_BASE}/analyze`;
+const LEXICON_SYNC_MS = 60_000;   // how often to check /health for a new lexicon
 
 interface HistoryPoint { index: number; score: number; }
 interface SessionEntry { text: string; score: number; ts: string; }
@@ -52,20 +56,37 @@ function App() {
   const [copied, setCopied] = useState(false);
   const debounceRef = useRef<ReturnType<typeof setTimeout>>(null);
   const historyIdx = useRef(0);
+  const lexiconFilter = useRef<LexiconFilter | null>(null);
 
-  const recordResult = useCallback((data: AnalyzeMetadata, inputText: string) => {
+  useEffect(() => {
+    let alive = true;
+    const sync = () => syncLexiconFilter(API_BASE, lexiconFilter.current)
+      .then(f => { if (alive) lexiconFilter.current = f; });
+    sync();
+    const id = setInterval(sync, LEXICON_SYNC_MS);
+    window.addEventListener('focus', sync);
+    return () => { alive = false; clearInterval(id); window.removeEventListener('focus', sync); };
+  }, []);
+
+  // `fromServer` is false for pre-filtered texts: they have no latency to chart
+  const recordResult = useCallback((data: AnalyzeMetadata, inputText: string, fromServer = true) => {
     setMetadata(data);
     historyIdx.current += 1;
     setHistory(prev => [...prev, { index: historyIdx.current, score: data.risk_score }].slice(-40));
     setTotalAnalyzed(n => n + 1);
     if (data.risk_score > threshold * 100) setToxicCount(n => n + 1);
-    setLatencies(prev => [...prev, data.processing_time_ms].slice(-60));
+    if (fromServer) setLatencies(prev => [...prev, data.processing_time_ms].slice(-60));
     const ts = new Date().toLocaleTimeString('en-GB');
     setSession(prev => [{ text: inputText.slice(0, 60), score: data.risk_score, ts }, ...prev].slice(0, 30));
   }, [threshold]);
 
   const analyzeText = useCallback(async (inputStr: string) => {
     if (!inputStr.trim()) { setMetadata(null); return; }
+    // No lexicon term present → the server would return the clean baseline
+    if (lexiconFilter.current && !mightBeToxic(lexiconFilter.current, inputStr)) {
+      recordResult(cleanResult(inputStr), inputStr, false);
+      return;
+    }
     setIsAnalyzing(true);
     try {
       const ctrl = new AbortController();
@@ -0,0 +1,153 @@
+import type { AnalyzeMetadata } from './types';
+
+/*
+ * Client-side lexicon pre-filter.
+ *
+ * The backend exports a Bloom filter over every lexicon term from
+ * GET /lexicon/bloom: keywords as token n-grams, and phrases (matched as
+ * substrings by the model) as short prefixes of the lowercased text. Text
+ * with no hit can't score above the clean baseline, so the live editor
+ * skips the /analyze round trip for it. Hashing and probing must stay in
+ * sync with backend/prefilter.py.
+ *
+ * The filter is fetched by version (GET /health → lexicon_version, then
+ * /lexicon/bloom?v=<version>), so the browser can cache it for good and a
+ * lexicon change on the server is picked up by the next sync.
+ */
+
+const FORMAT = 'bloom-fnv1a-v3';
+const FNV_PRIME = 0x01000193;
+
+interface BloomExport {
+    version: string;
+    format: string;
+    seeds: [number, number];
+    m: number;
+    k: number;
+    n: number;
+    max_ngram: number;
+    substring_lengths: number[];
+    substring_prefix: string;
+    probe_false_positive_rate: number;
+    char_false_positive_rate: number;
+    bits: string;
+}
+
+export interface LexiconFilter {
+    version: string;
+    probeFalsePositiveRate: number;
+    charFalsePositiveRate: number;
+    m: number;
+    k: number;
+    maxNgram: number;
+    substringLengths: number[];
+    substringPrefix: string;
+    seeds: [number, number];
+    bits: Uint8Array;
+}
+
+const encoder = new TextEncoder();
+
+function fnv1a(data: Uint8Array, seed: number): number {
+    let h = seed >>> 0;
+    for (let i = 0; i < data.length; i++) {
+        h = Math.imul(h ^ data[i], FNV_PRIME) >>> 0;
+    }
+    return h;
+}
+
+function hasTerm(f: LexiconFilter, term: string): boolean {
+    const data = encoder.encode(term);
+    const h1 = fnv1a(data, f.seeds[0]);
+    const h2 = (fnv1a(data, f.seeds[1]) | 1) >>> 0;
+    for (let i = 0; i < f.k; i++) {
+        const j = ((h1 + Math.imul(i, h2)) >>> 0) % f.m;
+        if ((f.bits[j >> 3] & (1 << (j & 7))) === 0) return false;
+    }
+    return true;
+}
+
+/** Current lexicon version from /health; null if unknown. */
+export async function fetchLexiconVersion(apiBase: string): Promise<string | null> {
+    try {
+        const res = await fetch(`${apiBase}/health`, { cache: 'no-store' });
+        if (!res.ok) return null;
+        const data = await res.json();
+        return typeof data.lexicon_version === 'string' ? data.lexicon_version : null;
+    } catch {
+        return null;
+    }
+}
+
+/** Fetch one filter version; null if the server has none (e.g. classifier-only engine). */
+export async function loadLexiconFilter(apiBase: string, version: string): Promise<LexiconFilter | null> {
+    try {
+        // Versioned URL is served immutable, so repeat loads come from cache
+        const res = await fetch(`${apiBase}/lexicon/bloom?v=${encodeURIComponent(version)}`);
+        if (!res.ok) return null;
+        const data: BloomExport = await res.json();
+        if (data.format !== FORMAT || data.version !== version) return null;
+        const raw = atob(data.bits);
+        const bits = new Uint8Array(raw.length);
+        for (let i = 0; i < raw.length; i++) bits[i] = raw.charCodeAt(i);
+        return {
+            version: data.version,
+            probeFalsePositiveRate: data.probe_false_positive_rate,
+            charFalsePositiveRate: data.char_false_positive_rate,
+            m: data.m,
+            k: data.k,
+            maxNgram: data.max_ngram,
+            substringLengths: data.substring_lengths,
+            substringPrefix: data.substring_prefix,
+            seeds: data.seeds,
+            bits,
+        };
+    } catch {
+        return null;
+    }
+}
+
+/**
+ * Filter matching the server's current lexicon: `current` if still up to
+ * date, else a fresh load. null (no pre-filtering) when the version can't
+ * be checked, so a stale filter is never used.
+ */
+export async function syncLexiconFilter(apiBase: string, current: LexiconFilter | null): Promise<LexiconFilter | null> {
+    const version = await fetchLexiconVersion(apiBase);
+    if (version === null) return null;
+    if (current && current.version === version) return current;
+    return loadLexiconFilter(apiBase, version);
+}
+
+/** True if any lexicon rule might fire on `text` (no false negatives). */
+export function mightBeToxic(f: LexiconFilter, text: string): boolean {
+    const lower = text.toLowerCase();
+    const tokens = lower.match(/[\p{L}\p{N}_]+/gu) ?? [];
+    for (let i = 0; i < tokens.length; i++) {
+        let gram = '';
+        for (let size = 1; size <= f.maxNgram && i + size <= tokens.length; size++) {
+            gram = size === 1 ? tokens[i] : `${gram} ${tokens[i + size - 1]}`;
+            if (hasTerm(f, gram)) return true;
+        }
+    }
+    // Phrase prefixes are ASCII, so UTF-16 windows match them like Python's
+    for (const size of f.substringLengths) {
+        for (let i = 0; i + size <= lower.length; i++) {
+            if (hasTerm(f, f.substringPrefix + lower.slice(i, i + size))) return true;
+        }
+    }
+    return false;
+}
+
+/** The result the lexicon model returns for text with no matches. */
+export function cleanResult(text: string): AnalyzeMetadata {
+    // Python len() counts code points, not UTF-16 units
+    const length = [...text].length;
+    const base = Math.round((0.03 + (length % 7) * 0.005) * 10000) / 10000;
+    return {
+        risk_score: 2.0,
+        labels: { Threat: base, 'Hate Speech': base, Insult: base, Obscenity: base, Sarcasm: base },
+        highlights: [],
+        processing_time_ms: 0,
+    };
+}